@@ -1,16 +1,38 @@
+import os
+import weakref
 from flask import Flask
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_bootstrap import Bootstrap
 from flask_login import LoginManager
 from flask_wtf import CSRFProtect
 from config import Config
+from app.cache import ReferenceData, UserCache
+from app.page_cache import PageCache
+from app.thumbnails import Thumbnails
+from app.metrics import Metrics
+from app.compression import Compression
+from app.assets import Assets
+from app.passwords import Passwords
+from app.ratelimit import RateLimiter
+from app.database import RoutingSession, init_engine_options, install_connect_hooks, init_replica_routing
 
-db = SQLAlchemy()
+# Сессия сама выбирает основную БД или реплику (см. app/database.py)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 bootstrap = Bootstrap()
 login = LoginManager()
 csrf = CSRFProtect()
+reference_data = ReferenceData()
+user_cache = UserCache()
+page_cache = PageCache()
+thumbnails = Thumbnails()
+metrics = Metrics()
+compression = Compression()
+assets = Assets()
+passwords = Passwords()
+limiter = RateLimiter()
 
 login.login_view = 'auth.login'
 login.login_message = 'Пожалуйста, войдите для доступа к этой странице.'
@@ -20,26 +42,74 @@ def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # За обратным прокси: адрес клиента и схема из X-Forwarded-* (число прокси)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        proxies = app.config['PROXY_FIX_X_FOR']
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies)
+
+    init_engine_options(app)
     db.init_app(app)
+    with app.app_context():
+        install_connect_hooks(app, db.engines)
+    init_replica_routing(app)
     migrate.init_app(app, db)
     bootstrap.init_app(app)
     login.init_app(app)
     csrf.init_app(app)
+    reference_data.init_app(app)
+    user_cache.init_app(app)
+    page_cache.init_app(app)
+    thumbnails.init_app(app)
+    metrics.init_app(app)
+    # После metrics: after_request вызываются в обратном порядке, и сжатие попадает в Server-Timing
+    compression.init_app(app)
+    assets.init_app(app)
+    passwords.init_app(app)
+    limiter.init_app(app)
 
-    # Настраиваем user_loader для Flask-Login
-    from app.models import User
-    
+    # Настраиваем user_loader для Flask-Login (через кэш пользователей)
     @login.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
+        return user_cache.load(int(user_id))
 
     # Регистрируем Blueprint'ы
     from app.routes.main import bp as main_bp
     from app.routes.auth import auth_bp
+    from app.routes.api import api_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
+    app.register_blueprint(api_bp)
+
+    # CLI-команды (flask check-query-plans и др.)
+    from app.cli import register_commands
+    register_commands(app)
+
+    # Сброс состояния мастер-процесса в воркерах (gunicorn --preload и т.п.)
+    _reset_after_fork(app)
 
     return app
 
+def _reset_after_fork(app):
+    """Регистрирует сброс пула соединений и фоновых потоков в дочернем процессе.
+
+    create_app сам соединений не открывает, но если мастер успел обратиться
+    к БД, сокеты пула нельзя делить между процессами.
+    """
+    app_ref = weakref.ref(app)
+
+    def reset():
+        app = app_ref()
+        if app is None:
+            return
+        with app.app_context():
+            for engine in db.engines.values():
+                # close=False: соединения родителя не закрываем, а просто забываем
+                engine.dispose(close=False)
+        app.extensions['thumbnails'].executor = None
+        passwords.reset(app)
+
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=reset)
+
 from app import models
\ No newline at end of file
@@ -0,0 +1,213 @@
+"""Статика: вендоринг сторонних файлов, отпечатки и предварительное сжатие.
+
+1. `flask vendor-assets` скачивает сторонние файлы из VENDOR_ASSETS
+   в app/static/vendor/ и сверяет их SHA-384; файлы лежат в репозитории,
+   команда нужна только при смене версии.
+2. `flask build-assets` (на деплое) копирует всю app/static в
+   app/static/dist/ с хэшем содержимого в имени, рядом кладет .gz и,
+   если есть пакет brotli, .br, и пишет manifest.json.
+3. В шаблонах asset_url('vendor/bootstrap.min.css') дает адрес
+   /assets/bootstrap.min.<hash>.css. Такой файл никогда не меняется,
+   поэтому отдается с вечным кэшированием, а сжатая копия выбирается
+   по Accept-Encoding без сжатия на лету.
+
+Без сборки asset_url указывает на обычную /static/.... Внешних CDN нет:
+если стороннего файла нет на диске, не запускается сервер (wsgi.py, run.py)
+и не собирается build-assets (AssetError). Команды flask при этом работают,
+чтобы файлы можно было скачать.
+"""
+import base64
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import tempfile
+import urllib.request
+from flask import current_app, send_file, url_for, abort
+from app.compression import COMPRESSIBLE_MIMETYPES, choose_encoding
+
+try:
+    import brotli
+except ImportError:  # без brotli собираются только .gz
+    brotli = None
+
+MANIFEST_NAME = 'manifest.json'
+# Расширения предварительно сжатых копий по кодировке
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+# Сторонние файлы: путь в static -> (адрес, SHA-384 в base64 как в SRI)
+VENDOR_ASSETS = {
+    'vendor/bootstrap.min.css': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/css/bootstrap.min.css',
+        'QWTKZyjpPEjISv5WaRU9OFeRpok6YctnYmDr5pNlyT2bRjXh0JMhjY6hW+ALEwIH',
+    ),
+    'vendor/bootstrap.bundle.min.js': (
+        'https://cdn.jsdelivr.net/npm/bootstrap@5.3.3/dist/js/bootstrap.bundle.min.js',
+        'YvpcrYf0tY3lHB60NNkmXc5s9fDVZLESaAA55NDzOxhy9GkcIdslK1eN7N6jIeHz',
+    ),
+}
+
+
+class AssetError(Exception):
+    """Сторонний файл не скачан или не совпал с ожидаемым хэшем"""
+
+
+def sri_sha384(data):
+    return base64.b64encode(hashlib.sha384(data).digest()).decode('ascii')
+
+
+def vendor_assets(static_folder, force=False, fetch=None):
+    """Скачивает VENDOR_ASSETS в static_folder; возвращает список скачанных"""
+    fetch = fetch or _urlopen
+    downloaded = []
+    for name, (url, expected) in VENDOR_ASSETS.items():
+        path = os.path.join(static_folder, name)
+        if os.path.exists(path) and not force:
+            with open(path, 'rb') as f:
+                if sri_sha384(f.read()) == expected:
+                    continue
+        data = fetch(url)
+        if sri_sha384(data) != expected:
+            raise AssetError(f'{url}: SHA-384 не совпадает с ожидаемым')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        downloaded.append(name)
+    return downloaded
+
+
+def missing_vendor_assets(static_folder):
+    """Сторонние файлы, которые еще не скачаны в static_folder"""
+    return [name for name in VENDOR_ASSETS if not os.path.exists(os.path.join(static_folder, name))]
+
+
+def check_vendor_assets(static_folder):
+    """AssetError, если каких-то сторонних файлов нет на диске"""
+    missing = missing_vendor_assets(static_folder)
+    if missing:
+        raise AssetError(f"Нет файлов {', '.join(missing)} в {static_folder}: запустите flask vendor-assets")
+
+
+def _urlopen(url):
+    with urllib.request.urlopen(url, timeout=30) as response:
+        return response.read()
+
+
+def fingerprinted_name(name, data):
+    """css/site.css -> css/site.<хэш>.css"""
+    stem, ext = os.path.splitext(name)
+    return f'{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}'
+
+
+def _precompress(path, data):
+    """Пишет .gz и .br рядом с файлом, если они меньше оригинала"""
+    variants = [('.gz', gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append(('.br', brotli.compress(data, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(data):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+def build_assets(static_folder, output_dir, clean=False):
+    """Собирает static_folder в output_dir; возвращает манифест {имя: имя с хэшем}
+
+    Файлы прошлых сборок остаются (если не clean): закэшированные страницы
+    и воркеры со старым манифестом продолжают на них ссылаться.
+    """
+    if clean and os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = {}
+    for root, dirs, files in os.walk(static_folder):
+        # Результат прошлой сборки не собираем повторно
+        dirs[:] = sorted(d for d in dirs if os.path.join(root, d) != output_dir)
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            name = os.path.relpath(source, static_folder).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                data = f.read()
+            target_name = fingerprinted_name(name, data)
+            target = os.path.join(output_dir, *target_name.split('/'))
+            if os.path.exists(target):
+                manifest[name] = target_name
+                continue
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(data)
+            if mimetypes.guess_type(name)[0] in COMPRESSIBLE_MIMETYPES:
+                _precompress(target, data)
+            manifest[name] = target_name
+    fd, tmp_path = tempfile.mkstemp(dir=output_dir, prefix='.tmp')
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, os.path.join(output_dir, MANIFEST_NAME))
+    return manifest
+
+
+def _load_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class Assets:
+    """asset_url в шаблонах и маршрут /assets (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('ASSETS_DIR', os.path.join(app.static_folder, 'dist'))
+        manifest = _load_manifest(app.config['ASSETS_DIR'])
+        app.extensions['assets'] = {
+            'manifest': manifest,
+            'files': frozenset(manifest.values()),
+        }
+        app.add_url_rule('/assets/<path:filename>', 'asset', serve_asset)
+        app.add_template_global(asset_url)
+
+    def reload(self):
+        """Перечитывает манифест после build-assets"""
+        state = current_app.extensions['assets']
+        state['manifest'] = _load_manifest(current_app.config['ASSETS_DIR'])
+        state['files'] = frozenset(state['manifest'].values())
+        # Ссылки в HTML поменялись — ETag страниц тоже должны
+        current_app.extensions.pop('templates_fingerprint', None)
+
+
+def asset_url(name):
+    """Адрес статического файла: собранный или обычный"""
+    hashed = current_app.extensions['assets']['manifest'].get(name)
+    if hashed is not None:
+        return url_for('asset', filename=hashed)
+    return url_for('static', filename=name)
+
+
+def serve_asset(filename):
+    """Собранный файл с вечным кэшированием и готовой сжатой копией"""
+    if filename not in current_app.extensions['assets']['files']:
+        abort(404)
+    path = os.path.join(current_app.config['ASSETS_DIR'], *filename.split('/'))
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    available = [encoding for encoding, suffix in ENCODING_SUFFIXES.items()
+                 if os.path.exists(path + suffix)]
+    encoding = choose_encoding(available) if available else None
+    if encoding is not None:
+        response = send_file(path + ENCODING_SUFFIXES[encoding], mimetype=mimetype, conditional=True)
+        response.headers['Content-Encoding'] = encoding
+    else:
+        response = send_file(path, mimetype=mimetype, conditional=True)
+    if available:
+        response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,287 @@
+"""Кэши приложения в памяти процесса.
+
+ReferenceData — справочники карт и гранат. Они меняются раз в операцию CS2,
+поэтому держим их снимок в памяти с TTL и сбрасываем после коммита,
+в котором менялись Map или Grenade.
+
+UserCache — пользователи для Flask-Login, чтобы не ходить в БД за
+current_user на каждом запросе.
+"""
+import threading
+import time
+import weakref
+from collections import namedtuple, OrderedDict
+from flask import current_app, abort
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class TTLCache:
+    """Потокобезопасный LRU-кэш с ограничением размера и временем жизни записей"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[1] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[0]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        """Счетчики для мониторинга"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+# Легкие неизменяемые копии строк: их можно безопасно делить между запросами
+MapRef = namedtuple('MapRef', ['id', 'name', 'display_name'])
+GrenadeRef = namedtuple('GrenadeRef', ['id', 'name', 'display_name', 'color'])
+
+
+class ReferenceSnapshot:
+    """Снимок справочников с индексами по id и name"""
+
+    def __init__(self, maps, grenades):
+        self.maps = maps
+        self.grenades = grenades
+        self.maps_by_id = {m.id: m for m in maps}
+        self.maps_by_name = {m.name: m for m in maps}
+        self.grenades_by_id = {g.id: g for g in grenades}
+        self.grenades_by_name = {g.name: g for g in grenades}
+        self.map_choices = [(m.id, m.display_name) for m in sorted(maps, key=lambda m: m.display_name)]
+        self.grenade_choices = [(g.id, g.display_name) for g in sorted(grenades, key=lambda g: g.display_name)]
+
+    @classmethod
+    def load(cls):
+        from app.models import Map, Grenade
+        maps = [MapRef(m.id, m.name, m.display_name) for m in Map.query.order_by(Map.id)]
+        grenades = [GrenadeRef(g.id, g.name, g.display_name, g.color)
+                    for g in Grenade.query.order_by(Grenade.id)]
+        return cls(maps, grenades)
+
+
+class _ReferenceCache:
+    """Снимок справочников одного приложения"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._snapshot = None
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return snapshot
+        with self._lock:
+            # Пока ждали блокировку, снимок мог обновить другой поток
+            if self._snapshot is snapshot or time.monotonic() - self._loaded_at >= self.ttl:
+                self._snapshot = ReferenceSnapshot.load()
+                self._loaded_at = time.monotonic()
+            return self._snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+
+# Все кэши процесса, чтобы сбрасывать их из событий сессии без контекста приложения
+_caches = weakref.WeakSet()
+
+
+class ReferenceData:
+    """Кэш справочников карт и гранат (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # TTL в секундах; 0 отключает кэширование
+        app.config.setdefault('REFERENCE_CACHE_TTL', 300)
+        cache = _ReferenceCache(app.config['REFERENCE_CACHE_TTL'])
+        _caches.add(cache)
+        app.extensions['reference_data'] = cache
+
+    @property
+    def snapshot(self):
+        return current_app.extensions['reference_data'].get()
+
+    def maps(self):
+        return self.snapshot.maps
+
+    def grenades(self):
+        return self.snapshot.grenades
+
+    def map_choices(self):
+        return self.snapshot.map_choices
+
+    def grenade_choices(self):
+        return self.snapshot.grenade_choices
+
+    def get_map(self, map_id):
+        return self.snapshot.maps_by_id.get(map_id)
+
+    def get_grenade(self, grenade_id):
+        return self.snapshot.grenades_by_id.get(grenade_id)
+
+    def get_map_or_404(self, map_id):
+        return self.get_map(map_id) or abort(404)
+
+    def get_grenade_or_404(self, grenade_id):
+        return self.get_grenade(grenade_id) or abort(404)
+
+    def map_by_name(self, name):
+        return self.snapshot.maps_by_name.get(name)
+
+    def grenade_by_name(self, name):
+        return self.snapshot.grenades_by_name.get(name)
+
+    def invalidate(self):
+        current_app.extensions['reference_data'].invalidate()
+
+
+# Все кэши пользователей процесса (для сброса из событий сессии)
+_user_caches = weakref.WeakSet()
+
+
+class UserCache:
+    """Кэш пользователей для user_loader (подключается как расширение Flask)
+
+    В кэше лежит отсоединенная копия User со всеми колонками. На каждый запрос
+    она присоединяется к сессии через merge(load=False) без обращения к БД,
+    поэтому связи (current_user.videos) по-прежнему подгружаются лениво.
+    Кэш свой у каждого процесса: invalidate() сбрасывает только его, а другие
+    воркеры видят смену роли или удаление лишь через USER_CACHE_TTL секунд.
+    Поэтому кэш выключен по умолчанию.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # TTL в секундах; 0 (по умолчанию) отключает кэш и user_loader всегда идет в БД
+        app.config.setdefault('USER_CACHE_TTL', 0)
+        app.config.setdefault('USER_CACHE_SIZE', 1024)
+        cache = None
+        if app.config['USER_CACHE_TTL']:
+            cache = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+            _user_caches.add(cache)
+        app.extensions['user_cache'] = cache
+
+    @property
+    def cache(self):
+        return current_app.extensions['user_cache']
+
+    def load(self, user_id):
+        """Пользователь по id, присоединенный к текущей сессии"""
+        from app import db
+        from app.models import User
+
+        cache = self.cache
+        if cache is None:
+            return db.session.get(User, user_id)
+
+        cached = cache.get(user_id)
+        if cached is None:
+            # Грузим в отдельной сессии, чтобы в кэш попал чистый объект,
+            # не связанный с сессией текущего запроса
+            with Session(db.engine) as session:
+                cached = session.get(User, user_id)
+            if cached is None:
+                return None
+            cache.set(user_id, cached)
+        return db.session.merge(cached, load=False)
+
+    def invalidate(self, user_id=None):
+        cache = self.cache
+        if cache is None:
+            return
+        if user_id is None:
+            cache.clear()
+        else:
+            cache.pop(user_id)
+
+    def stats(self):
+        cache = self.cache
+        return cache.stats() if cache is not None else None
+
+
+def invalidate_reference_caches():
+    """Сбрасывает справочники во всех приложениях процесса"""
+    for cache in list(_caches):
+        cache.invalidate()
+
+
+def invalidate_user_caches(user_ids):
+    """Убирает пользователей из кэшей всех приложений процесса"""
+    for cache in list(_user_caches):
+        for user_id in user_ids:
+            cache.pop(user_id)
+
+
+@event.listens_for(Session, 'after_flush')
+def _track_cached_changes(session, flush_context):
+    from app.models import User, Map, Grenade
+    changed = list(session.new) + list(session.dirty) + list(session.deleted)
+    if any(isinstance(obj, (Map, Grenade)) for obj in changed):
+        session.info['reference_data_changed'] = True
+    # Смена роли, имени и любых других полей пользователя
+    user_ids = {obj.id for obj in changed
+                if isinstance(obj, User) and (obj in session.deleted or session.is_modified(obj))}
+    if user_ids:
+        session.info.setdefault('changed_user_ids', set()).update(user_ids)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('reference_data_changed', False):
+        invalidate_reference_caches()
+    user_ids = session.info.pop('changed_user_ids', None)
+    if user_ids:
+        invalidate_user_caches(user_ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _forget_after_rollback(session):
+    session.info.pop('reference_data_changed', None)
+    session.info.pop('changed_user_ids', None)
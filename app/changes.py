@@ -0,0 +1,150 @@
+"""Лента изменений видео для инкрементальной синхронизации клиентов.
+
+Каждая вставка и правка Video получает номер change_seq из счетчика
+change_sequences, а удаление (и перенос видео в другую комбинацию)
+оставляет надгробие VideoTombstone со своим номером. Клиент хранит
+последний полученный номер и запрашивает только то, что изменилось после него.
+
+Счетчик увеличивается UPDATE-ом внутри транзакции записи, поэтому строка
+счетчика заблокирована до коммита: транзакции получают номера в порядке
+коммитов, и читатель не может пропустить номер, закоммиченный позже.
+"""
+from datetime import datetime, timedelta
+from sqlalchemy import event, inspect, select, func
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Video, VideoTombstone, ChangeSequence
+
+VIDEO_SEQUENCE = 'videos'
+# Номер, до которого надгробия уже удалены: клиентам со старым курсором нужна полная синхронизация
+PRUNED_SEQUENCE = 'video_tombstones_pruned'
+
+
+def allocate_change_seq(connection, count=1):
+    """Резервирует count последовательных номеров и возвращает первый из них"""
+    sequences = ChangeSequence.__table__
+    result = connection.execute(
+        sequences.update()
+        .where(sequences.c.name == VIDEO_SEQUENCE)
+        .values(value=sequences.c.value + count)
+    )
+    if result.rowcount == 0:
+        # Счетчик создает миграция; сюда попадаем только после db.create_all()
+        connection.execute(sequences.insert().values(name=VIDEO_SEQUENCE, value=count))
+        return 1
+    last = connection.execute(
+        select(sequences.c.value).where(sequences.c.name == VIDEO_SEQUENCE)
+    ).scalar_one()
+    return last - count + 1
+
+
+def _previous_combination(video):
+    """Комбинация (map_id, grenade_id) до изменений, если видео переносят"""
+    state = inspect(video)
+    map_history = state.attrs.map_id.history
+    grenade_history = state.attrs.grenade_id.history
+    if not map_history.has_changes() and not grenade_history.has_changes():
+        return None
+    old_map = map_history.deleted[0] if map_history.deleted else video.map_id
+    old_grenade = grenade_history.deleted[0] if grenade_history.deleted else video.grenade_id
+    if (old_map, old_grenade) == (video.map_id, video.grenade_id):
+        return None
+    return old_map, old_grenade
+
+
+@event.listens_for(Session, 'before_flush')
+def _record_video_changes(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, Video)]
+    dirty = [obj for obj in session.dirty if isinstance(obj, Video) and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if isinstance(obj, Video)]
+    if not (new or dirty or deleted):
+        return
+
+    # Надгробия для старой комбинации, чтобы ее подписчики узнали об уходе видео
+    moved = [(video, combination) for video in dirty
+             for combination in [_previous_combination(video)] if combination]
+
+    seq = allocate_change_seq(session.connection(), len(moved) + len(deleted) + len(new) + len(dirty))
+    for video, (map_id, grenade_id) in moved:
+        session.add(VideoTombstone(video_id=video.id, map_id=map_id, grenade_id=grenade_id, change_seq=seq))
+        seq += 1
+    for video in deleted:
+        session.add(VideoTombstone(video_id=video.id, map_id=video.map_id,
+                                   grenade_id=video.grenade_id, change_seq=seq))
+        seq += 1
+    for video in new + dirty:
+        video.change_seq = seq
+        seq += 1
+
+
+def _sequence_value(name):
+    value = db.session.query(ChangeSequence.value).filter_by(name=name).scalar()
+    return value or 0
+
+
+def changes_queries(cursor, limit, columns=(), map_id=None, grenade_id=None):
+    """Запросы видео и надгробий с номером больше cursor (по limit + 1 строк каждый)"""
+    videos = db.session.query(Video.change_seq.label('seq'), Video.id.label('id'), *columns) \
+        .filter(Video.change_seq > cursor)
+    tombstones = db.session.query(VideoTombstone).filter(VideoTombstone.change_seq > cursor)
+    if map_id:
+        videos = videos.filter(Video.map_id == map_id)
+        tombstones = tombstones.filter(VideoTombstone.map_id == map_id)
+    if grenade_id:
+        videos = videos.filter(Video.grenade_id == grenade_id)
+        tombstones = tombstones.filter(VideoTombstone.grenade_id == grenade_id)
+    return (videos.order_by(Video.change_seq).limit(limit + 1),
+            tombstones.order_by(VideoTombstone.change_seq).limit(limit + 1))
+
+
+def changes_since(cursor, limit, columns=(), map_id=None, grenade_id=None):
+    """Изменения с номером больше cursor: не больше limit записей по возрастанию номера.
+
+    columns — помеченные колонки видео для проекции (как в API).
+    Возвращает словарь с changes, cursor, has_more и reset.
+    """
+    # Клиенту с cursor=0 надгробия не нужны: ему достаются все живые видео
+    if 0 < cursor < _sequence_value(PRUNED_SEQUENCE):
+        # Нужные клиенту надгробия уже удалены — он должен скачать все заново
+        # и продолжить с текущего номера (взятого до скачивания, чтобы ничего не пропустить)
+        return {'changes': [], 'cursor': _sequence_value(VIDEO_SEQUENCE),
+                'has_more': False, 'reset': True}
+
+    videos, tombstones = changes_queries(cursor, limit, columns, map_id, grenade_id)
+    changes = [
+        {'op': 'upsert', 'seq': row.seq, 'video': row._asdict()}
+        for row in videos
+    ] + [
+        {'op': 'delete', 'seq': tombstone.change_seq, 'id': tombstone.video_id,
+         'map_id': tombstone.map_id, 'grenade_id': tombstone.grenade_id}
+        for tombstone in tombstones
+    ]
+    changes.sort(key=lambda change: change['seq'])
+    for change in changes:
+        if change['op'] == 'upsert':
+            del change['video']['seq']
+
+    page = changes[:limit]
+    return {
+        'changes': page,
+        'cursor': page[-1]['seq'] if page else cursor,
+        'has_more': len(changes) > limit,
+        'reset': False,
+    }
+
+
+def prune_tombstones(days):
+    """Удаляет надгробия старше days дней; возвращает число удаленных"""
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    last_pruned = db.session.query(func.max(VideoTombstone.change_seq)) \
+        .filter(VideoTombstone.deleted_at < cutoff).scalar()
+    if last_pruned is None:
+        return 0
+    deleted = VideoTombstone.query.filter(VideoTombstone.change_seq <= last_pruned).delete()
+    sequence = db.session.get(ChangeSequence, PRUNED_SEQUENCE)
+    if sequence is None:
+        db.session.add(ChangeSequence(name=PRUNED_SEQUENCE, value=last_pruned))
+    else:
+        sequence.value = max(sequence.value, last_pruned)
+    db.session.commit()
+    return deleted
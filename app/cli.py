@@ -0,0 +1,333 @@
+import click
+from flask.cli import with_appcontext
+
+
+@click.command('check-query-plans')
+@with_appcontext
+def check_query_plans():
+    """Проверяет, что горячие запросы маршрутов идут по индексам"""
+    from app.queries import HOT_QUERIES, query_plan, plan_problems
+
+    failed = False
+    for name, build_query in HOT_QUERIES.items():
+        plan = query_plan(build_query())
+        problems = plan_problems(plan)
+        status = 'FAIL' if problems else 'ok'
+        click.echo(f'[{status}] {name}')
+        for line in plan:
+            click.echo(f'    {line}')
+        failed = failed or bool(problems)
+
+    if failed:
+        raise click.ClickException('Есть запросы без подходящего индекса')
+    click.echo('Все запросы используют индексы.')
+
+
+def _seed_query_count_catalogue(size):
+    """Карта, граната и size видео, у каждого свой автор"""
+    from app import db
+    from app.models import User, Map, Grenade, Video
+
+    map_obj = Map(name='de_dust2', display_name='Dust II')
+    grenade = Grenade(name='smoke', display_name='Smoke Grenade', color='success')
+    db.session.add_all([map_obj, grenade])
+    for i in range(size):
+        author = User(username=f'user{i}', email=f'user{i}@example.com', password_hash='-')
+        db.session.add(Video(
+            title=f'Video {i}',
+            video_url=f'https://www.youtube.com/watch?v=video{i:06d}',
+            author=author,
+            map=map_obj,
+            grenade=grenade
+        ))
+    db.session.commit()
+    return map_obj.id, grenade.id
+
+
+@click.command('check-query-counts')
+@click.option('--sizes', default='1,30', show_default=True,
+              help='Размеры каталога через запятую')
+def check_query_counts(sizes):
+    """Проверяет, что число SQL-запросов на листинг и экспорт не растет с числом видео"""
+    from app import create_app, db
+    from app.queries import QueryCounter
+    from config import Config
+
+    class QueryCountConfig(Config):
+        SQLALCHEMY_DATABASE_URI = 'sqlite://'
+        TESTING = True
+
+    sizes = [int(size) for size in sizes.split(',')]
+    counts = {}
+    for size in sizes:
+        app = create_app(QueryCountConfig)
+        with app.app_context():
+            db.create_all()
+            map_id, grenade_id = _seed_query_count_catalogue(size)
+            client = app.test_client()
+            for endpoint in ('/videos', '/export-links'):
+                url = f'{endpoint}?map={map_id}&grenade={grenade_id}'
+                with QueryCounter() as counter:
+                    client.get(url)
+                counts.setdefault(endpoint, []).append(counter.count)
+            db.session.remove()
+            db.drop_all()
+
+    failed = False
+    for endpoint, endpoint_counts in counts.items():
+        constant = len(set(endpoint_counts)) == 1
+        status = 'ok' if constant else 'FAIL'
+        details = ', '.join(f'{size} видео: {count}' for size, count in zip(sizes, endpoint_counts))
+        click.echo(f'[{status}] {endpoint} — {details}')
+        failed = failed or not constant
+
+    if failed:
+        raise click.ClickException('Число запросов зависит от количества видео (N+1)')
+
+
+def _jpeg(size):
+    import io
+    from PIL import Image
+    output = io.BytesIO()
+    Image.new('RGB', size, (90, 120, 150)).save(output, 'JPEG')
+    return output.getvalue()
+
+
+@click.command('check-thumbnails')
+def check_thumbnails():
+    """Проверяет обработку превью на подставных ответах (нужен Pillow)"""
+    import tempfile
+    from app import create_app, db
+    from app.models import User, Map, Grenade, Video
+    from app.thumbnails import Image, ThumbnailNotFound, process_thumbnail, videos_to_fetch
+    from config import Config
+
+    if Image is None:
+        raise click.ClickException('Pillow не установлен (см. requirements.txt)')
+
+    large = _jpeg((1280, 720))
+    # youtube_id -> (ответ источника или исключение, ожидаемый статус)
+    cases = {
+        'thumbLarge0': (large, 'ok'),
+        'thumbHolder': (_jpeg((120, 90)), 'missing'),
+        'thumbGone00': (ThumbnailNotFound('404'), 'missing'),
+        'thumbHtml00': (b'<html>502 Bad Gateway</html>', 'error'),
+        'thumbTrunc0': (large[:len(large) // 2], 'error'),
+    }
+
+    def fetcher(youtube_id):
+        response = cases[youtube_id][0]
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    with tempfile.TemporaryDirectory() as thumbnail_dir:
+        class ThumbnailCheckConfig(Config):
+            SQLALCHEMY_DATABASE_URI = 'sqlite://'
+            TESTING = True
+            THUMBNAIL_DIR = thumbnail_dir
+            THUMBNAIL_FETCHER = staticmethod(fetcher)
+            THUMBNAIL_SOURCE_URL = '{youtube_id}'
+
+        app = create_app(ThumbnailCheckConfig)
+        with app.app_context():
+            db.create_all()
+            author = User(username='thumbs', email='thumbs@example.com', password_hash='-')
+            map_obj = Map(name='de_dust2', display_name='Dust II')
+            grenade = Grenade(name='smoke', display_name='Smoke Grenade', color='success')
+            videos = {youtube_id: Video(title=youtube_id, video_url=f'https://youtu.be/{youtube_id}',
+                                        author=author, map=map_obj, grenade=grenade)
+                      for youtube_id in cases}
+            db.session.add_all(videos.values())
+            db.session.commit()
+            ids = {youtube_id: video.id for youtube_id, video in videos.items()}
+            # Превью не должно менять видео для ETag, кэша страниц и ленты изменений
+            versions = {video.id: (video.updated_at, video.change_seq) for video in videos.values()}
+
+            failed = False
+            for youtube_id, (_, expected) in cases.items():
+                status = process_thumbnail(ids[youtube_id])
+                db.session.expire_all()
+                stored = db.session.get(Video, ids[youtube_id])
+                problems = []
+                if status != expected or stored.thumbnail_status != expected:
+                    problems.append(f'статус {status}/{stored.thumbnail_status}, ожидался {expected}')
+                if (stored.updated_at, stored.change_seq) != versions[stored.id]:
+                    problems.append('изменились updated_at или change_seq')
+                if expected == 'ok':
+                    with Image.open(app.extensions['thumbnails'].store.path(stored.thumbnail_hash)) as image:
+                        if image.width != app.config['THUMBNAIL_WIDTH']:
+                            problems.append(f'ширина {image.width}, ожидалась {app.config["THUMBNAIL_WIDTH"]}')
+                click.echo(f"[{'FAIL' if problems else 'ok'}] {youtube_id}: {'; '.join(problems) or expected}")
+                failed = failed or bool(problems)
+
+            # Повторно скачиваются только 'error'
+            retried = {video_id for (video_id,) in videos_to_fetch()}
+            expected_retry = {ids[youtube_id] for youtube_id, (_, status) in cases.items() if status == 'error'}
+            if retried != expected_retry:
+                click.echo(f'[FAIL] fetch-thumbnails выберет {sorted(retried)}, ожидалось {sorted(expected_retry)}')
+                failed = True
+            db.session.remove()
+            db.drop_all()
+
+    if failed:
+        raise click.ClickException('Превью обрабатываются неверно')
+    click.echo('Превью обрабатываются верно.')
+
+
+@click.command('clear-page-cache')
+@click.option('--expired', is_flag=True, help='Удалить только просроченные записи (для cron)')
+@with_appcontext
+def clear_page_cache(expired):
+    """Очищает кэш страниц списка видео"""
+    from app import page_cache
+    if expired:
+        click.echo(f'Удалено просроченных записей: {page_cache.prune()}')
+        return
+    page_cache.clear()
+    click.echo('Кэш страниц очищен.')
+
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_search_index():
+    """Перестраивает полнотекстовый индекс видео"""
+    from app.search import rebuild_search_index as rebuild
+    rebuild()
+    click.echo('Поисковый индекс перестроен.')
+
+
+@click.command('prune-tombstones')
+@click.option('--days', default=30, show_default=True, help='Сколько дней хранить записи об удалении')
+@with_appcontext
+def prune_tombstones(days):
+    """Удаляет старые записи об удалении видео из ленты изменений"""
+    from app.changes import prune_tombstones as prune
+    click.echo(f'Удалено записей: {prune(days)}')
+
+
+@click.command('repair-counters')
+@with_appcontext
+def repair_counters():
+    """Пересчитывает счетчики видео по комбинациям и авторам"""
+    from app.counters import repair_counters as repair
+    combinations, authors = repair()
+    click.echo(f'Счетчики пересчитаны: комбинаций {combinations}, авторов {authors}.')
+
+
+@click.command('import-videos')
+@click.argument('source', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'json', 'ndjson']),
+              help='Формат файла (по умолчанию — по расширению)')
+@click.option('--author', default='admin', show_default=True, help='Имя пользователя-автора видео')
+@click.option('--chunk-size', default=500, show_default=True, type=click.IntRange(1),
+              help='Сколько видео вставлять за одну транзакцию')
+@with_appcontext
+def import_videos(source, fmt, author, chunk_size):
+    """Импортирует раскидки из CSV, JSON или NDJSON (SOURCE может быть "-")
+
+    Колонки: title, description, url, map, grenade (map и grenade — name из справочников).
+    """
+    from app.importer import import_videos as run_import, IMPORT_FORMATS
+    if fmt is None:
+        fmt = source.name.rsplit('.', 1)[-1].lower()
+        if fmt not in IMPORT_FORMATS:
+            raise click.UsageError('Не удалось определить формат, укажите --format')
+
+    def report(stats):
+        click.echo(f'  добавлено {stats.inserted} ({stats.rate:.0f} строк/с)')
+
+    try:
+        stats = run_import(source, fmt, author, chunk_size=chunk_size, on_chunk=report)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+    for number, message in stats.errors:
+        click.echo(f'  запись {number}: {message}', err=True)
+    click.echo(f'Готово: добавлено {stats.inserted}, дубликатов {stats.duplicates}, '
+               f'ошибок {len(stats.errors)} за {stats.elapsed:.1f} с ({stats.rate:.0f} строк/с).')
+
+
+@click.command('fetch-thumbnails')
+@click.option('--all', 'recheck', is_flag=True, help='Перепроверить и уже скачанные превью')
+@with_appcontext
+def fetch_thumbnails(recheck):
+    """Скачивает локальные копии превью (новые и неудачные в прошлый раз)"""
+    from app import thumbnails
+    from app.thumbnails import videos_to_fetch
+    video_ids = [video_id for (video_id,) in videos_to_fetch(recheck)]
+    click.echo(f'Видео к обработке: {len(video_ids)}')
+    totals = thumbnails.process_all(video_ids)
+    click.echo(', '.join(f'{status}: {count}' for status, count in sorted(totals.items())) or 'Нечего делать.')
+
+
+@click.command('sync-replica')
+@with_appcontext
+def sync_replica():
+    """Копирует основную SQLite-базу в файл реплики (для проверки реплики локально)"""
+    import sqlite3
+    from app import db
+    from app.database import REPLICA_BIND
+    replica = db.engines.get(REPLICA_BIND)
+    if replica is None:
+        raise click.ClickException('Реплика не настроена (DATABASE_REPLICA_URL)')
+    primary = db.engines[None]
+    if primary.dialect.name != 'sqlite' or replica.dialect.name != 'sqlite':
+        raise click.ClickException('Команда только для SQLite; серверные СУБД реплицируются сами')
+    source = sqlite3.connect(primary.url.database)
+    target = sqlite3.connect(replica.url.database)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+    replica.dispose()
+    click.echo(f'Реплика {replica.url.database} обновлена.')
+
+
+@click.command('vendor-assets')
+@click.option('--force', is_flag=True, help='Скачать заново, даже если файлы на месте')
+@with_appcontext
+def vendor_assets_command(force):
+    """Скачивает сторонние CSS/JS в app/static/vendor (с проверкой SHA-384)"""
+    from flask import current_app
+    from app.assets import vendor_assets, AssetError
+    try:
+        downloaded = vendor_assets(current_app.static_folder, force=force)
+    except (AssetError, OSError) as error:
+        raise click.ClickException(str(error))
+    click.echo('Скачано: ' + ', '.join(downloaded) if downloaded else 'Все файлы уже на месте.')
+
+
+@click.command('build-assets')
+@click.option('--clean', is_flag=True, help='Удалить файлы прошлых сборок')
+@with_appcontext
+def build_assets_command(clean):
+    """Собирает статику с хэшами в именах и сжатыми копиями (.gz, .br)"""
+    from flask import current_app
+    from app import assets
+    from app.assets import build_assets, check_vendor_assets, AssetError
+    try:
+        check_vendor_assets(current_app.static_folder)
+    except AssetError as error:
+        raise click.ClickException(str(error))
+    manifest = build_assets(current_app.static_folder, current_app.config['ASSETS_DIR'], clean=clean)
+    assets.reload()
+    for name, hashed in sorted(manifest.items()):
+        click.echo(f'  {name} -> {hashed}')
+    click.echo(f"Собрано файлов: {len(manifest)} в {current_app.config['ASSETS_DIR']}")
+
+
+def register_commands(app):
+    """Регистрирует CLI-команды приложения"""
+    app.cli.add_command(check_query_plans)
+    app.cli.add_command(check_query_counts)
+    app.cli.add_command(check_thumbnails)
+    app.cli.add_command(clear_page_cache)
+    app.cli.add_command(rebuild_search_index)
+    app.cli.add_command(prune_tombstones)
+    app.cli.add_command(repair_counters)
+    app.cli.add_command(import_videos)
+    app.cli.add_command(fetch_thumbnails)
+    app.cli.add_command(sync_replica)
+    app.cli.add_command(vendor_assets_command)
+    app.cli.add_command(build_assets_command)
@@ -0,0 +1,127 @@
+"""Сжатие ответов gzip и brotli.
+
+Сжимаются текстовые ответы (HTML, JSON, CSV, текст) не короче
+COMPRESS_MIN_SIZE. Потоковые ответы (экспорт) сжимаются по кускам:
+каждый кусок сбрасывается в сеть сразу, поэтому выгрузка по-прежнему
+идет по мере чтения из БД. brotli используется, если установлен пакет
+brotli и клиент его принимает, иначе gzip.
+
+Файлы (send_file) и уже сжатые ответы не трогаются. За прокси, который
+сжимает сам, отключается через COMPRESS_ENABLED.
+"""
+import zlib
+from flask import current_app, request
+
+try:
+    import brotli
+except ImportError:  # без brotli — только gzip
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'text/html', 'text/plain', 'text/csv', 'text/css', 'text/javascript',
+    'application/json', 'application/x-ndjson', 'application/javascript', 'image/svg+xml',
+})
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        # wbits=31 — формат gzip (заголовок и CRC), а не голый deflate
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data, flush=False):
+        output = self._compressor.compress(data)
+        return output + self._compressor.flush(zlib.Z_SYNC_FLUSH) if flush else output
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data, flush=False):
+        output = self._compressor.process(data)
+        return output + self._compressor.flush() if flush else output
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+def available_encodings():
+    """Поддерживаемые кодировки в порядке предпочтения"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def choose_encoding(available=None):
+    """Лучшая кодировка из Accept-Encoding запроса или None"""
+    return request.accept_encodings.best_match(available or available_encodings())
+
+
+def make_encoder(encoding, config):
+    if encoding == 'br':
+        return BrotliEncoder(config['COMPRESS_BROTLI_QUALITY'])
+    return GzipEncoder(config['COMPRESS_LEVEL'])
+
+
+def _compress_stream(chunks, encoder):
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if chunk:
+                yield encoder.compress(chunk, flush=True)
+        yield encoder.finish()
+    finally:
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    """Сжимает подходящий ответ под Accept-Encoding запроса"""
+    config = current_app.config
+    if (response.status_code < 200 or response.status_code in (204, 206, 304)
+            or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in config['COMPRESS_MIMETYPES']):
+        return response
+    # Ответ зависит от Accept-Encoding, даже если этот клиент сжатие не принял
+    response.vary.add('Accept-Encoding')
+    encoding = choose_encoding()
+    if encoding is None:
+        return response
+
+    encoder = make_encoder(encoding, config)
+    if response.is_streamed:
+        response.response = _compress_stream(response.response, encoder)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+        response.set_data(encoder.compress(data) + encoder.finish())
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class Compression:
+    """Сжатие ответов (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIMETYPES', COMPRESSIBLE_MIMETYPES)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 500)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        # Для ответов на лету: 11 сжимает лучше, но в десятки раз медленнее
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+        if app.config['COMPRESS_ENABLED']:
+            app.after_request(compress_response)
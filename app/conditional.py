@@ -0,0 +1,133 @@
+"""Условные GET-запросы (ETag) для списков и экспорта.
+
+Валидатор комбинации — MAX(updated_at) и COUNT(*) по ее видео: любое
+добавление, правка или удаление меняет хотя бы одно из значений. Запрос
+читает только индекс ix_videos_map_grenade_updated, поэтому ответ 304
+обходится одним дешевым запросом без рендера шаблонов.
+
+Last-Modified не отдается: MAX(updated_at) не меняется при удалении видео
+(а при удалении самого нового уходит назад), и клиент, который проверяет
+только If-Modified-Since, получил бы 304 на устаревшую копию.
+"""
+import hashlib
+import json
+import os
+from functools import wraps
+from flask import current_app, g, request, session, make_response
+from flask_login import current_user
+from sqlalchemy import func
+from app import db
+from app.models import Video
+
+
+class Validator:
+    """ETag ответа"""
+
+    def __init__(self, etag):
+        self.etag = etag
+
+    def matches(self):
+        """Есть ли у клиента актуальная копия"""
+        return request.if_none_match.contains_weak(self.etag)
+
+    def apply(self, response):
+        response.set_etag(self.etag, weak=True)
+        # Кэшировать можно, но перед использованием всегда перепроверять
+        response.cache_control.no_cache = True
+        if current_user.is_authenticated:
+            response.cache_control.private = True
+        else:
+            response.cache_control.public = True
+        response.vary.add('Cookie')
+        return response
+
+
+def templates_fingerprint(app):
+    """Хэш исходников шаблонов и манифеста статики: после деплоя с новой версткой ETag меняются"""
+    fingerprint = app.extensions.get('templates_fingerprint')
+    if fingerprint is None:
+        digest = hashlib.sha1()
+        template_dir = os.path.join(app.root_path, app.template_folder)
+        for root, dirs, files in sorted(os.walk(template_dir)):
+            for name in sorted(files):
+                with open(os.path.join(root, name), 'rb') as f:
+                    digest.update(f.read())
+        assets = app.extensions.get('assets')
+        if assets:
+            digest.update(json.dumps(assets['manifest'], sort_keys=True).encode())
+        fingerprint = app.extensions['templates_fingerprint'] = digest.hexdigest()
+    return fingerprint
+
+
+def make_validator(*parts):
+    """Validator из данных ответа с учетом шаблонов и текущего пользователя"""
+    if current_user.is_authenticated:
+        # В шапке страницы имя пользователя, а кнопки зависят от роли
+        viewer = f'{current_user.id}:{current_user.username}:{current_user.role}'
+    else:
+        viewer = 'anonymous'
+    raw = '|'.join(str(part) for part in (templates_fingerprint(current_app), viewer) + parts)
+    return Validator(hashlib.sha1(raw.encode()).hexdigest())
+
+
+def videos_state_query(map_id=None, grenade_id=None):
+    """MAX(updated_at) и COUNT(*) по видео комбинации, карты или всего каталога"""
+    query = db.session.query(func.max(Video.updated_at), func.count())
+    if map_id:
+        query = query.filter(Video.map_id == map_id)
+    if grenade_id:
+        query = query.filter(Video.grenade_id == grenade_id)
+    return query
+
+
+def videos_state(map_id=None, grenade_id=None):
+    """Пара (MAX(updated_at), count) для валидатора"""
+    return videos_state_query(map_id, grenade_id).one()
+
+
+def videos_validator(map_id=None, grenade_id=None):
+    """Валидатор набора видео вместе с подписями карты и гранаты"""
+    from app import reference_data
+    updated_at, count = videos_state(map_id, grenade_id)
+    return make_validator(
+        reference_data.get_map(map_id),
+        reference_data.get_grenade(grenade_id),
+        count,
+        updated_at
+    )
+
+
+def listing_validator():
+    """Валидатор списка по комбинации из параметров map и grenade"""
+    map_id = request.args.get('map', type=int)
+    grenade_id = request.args.get('grenade', type=int)
+    if not map_id or not grenade_id:
+        return None
+    return videos_validator(map_id, grenade_id)
+
+
+def conditional(compute_validator):
+    """Отвечает 304, если валидатор из compute_validator() совпал с запросом.
+
+    compute_validator может вернуть None — тогда запрос обрабатывается как обычно
+    (например, не хватает параметров и представление сделает редирект).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Страница с неотданными flash-сообщениями уникальна
+            if session.get('_flashes'):
+                return view(*args, **kwargs)
+            validator = compute_validator()
+            if validator is None:
+                return view(*args, **kwargs)
+            # Для кэша страниц: его ключ строится по тому же ETag
+            g.validator = validator
+            if validator.matches():
+                return validator.apply(current_app.response_class(status=304))
+            response = make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                validator.apply(response)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,136 @@
+"""Денормализованные счетчики видео по комбинациям и по авторам.
+
+Счетчики меняются в той же транзакции, что и сами видео (событие
+after_flush: внешние ключи уже заполнены, а история атрибутов еще
+доступна), поэтому добавление, правка и удаление через ORM держат их
+в актуальном состоянии. Изменение — атомарный upsert (INSERT ... ON CONFLICT
+DO UPDATE SET count = count + delta) без чтения старого значения: две транзакции,
+первыми добавляющие видео в одну комбинацию, не столкнутся на первичном ключе. Если счетчики все же разошлись с таблицей
+videos (ручные правки в БД), их пересчитывает `flask repair-counters`.
+"""
+from collections import Counter
+from sqlalchemy import event, inspect, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app import db
+from app.models import Video, CombinationStats, AuthorStats
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+# Без active_history присваивание атрибуту, истекшему после commit, не загружает
+# старое значение, и перенос видео в другую комбинацию не виден в истории
+for _attr in (Video.map_id, Video.grenade_id, Video.author_id):
+    event.listen(_attr, 'set', _load_old_value, active_history=True, retval=True)
+
+
+def _committed(video, attr):
+    """Значение атрибута до несохраненных изменений"""
+    history = getattr(inspect(video).attrs, attr).history
+    return history.deleted[0] if history.deleted else getattr(video, attr)
+
+
+def video_count_deltas(new=(), deleted=(), moved=()):
+    """Изменения счетчиков: new и deleted — пары (комбинация, автор), moved — пары старых и новых"""
+    combinations, authors = Counter(), Counter()
+    for combination, author_id in new:
+        combinations[combination] += 1
+        authors[author_id] += 1
+    for combination, author_id in deleted:
+        combinations[combination] -= 1
+        authors[author_id] -= 1
+    for (old_combination, old_author), (combination, author_id) in moved:
+        combinations[old_combination] -= 1
+        combinations[combination] += 1
+        authors[old_author] -= 1
+        authors[author_id] += 1
+    return combinations, authors
+
+
+# Диалекты с INSERT ... ON CONFLICT
+UPSERT_INSERTS = {
+    'sqlite': sqlite.insert,
+    'postgresql': postgresql.insert,
+}
+
+
+def _bump(connection, table, key, delta):
+    insert = UPSERT_INSERTS.get(connection.dialect.name)
+    if insert is not None:
+        statement = insert(table).values(video_count=delta, **key)
+        connection.execute(statement.on_conflict_do_update(
+            index_elements=list(key),
+            set_={'video_count': table.c.video_count + statement.excluded.video_count}
+        ))
+        return
+    # Прочие диалекты: UPDATE, а если строки нет — INSERT
+    where = [table.c[name] == value for name, value in key.items()]
+    result = connection.execute(
+        table.update().where(*where).values(video_count=table.c.video_count + delta)
+    )
+    if result.rowcount == 0:
+        connection.execute(table.insert().values(video_count=delta, **key))
+
+
+def apply_video_counts(connection, combinations, authors):
+    """Применяет изменения счетчиков в транзакции connection"""
+    # Одинаковый порядок блокировок строк во всех транзакциях — без взаимных блокировок
+    for (map_id, grenade_id), delta in sorted(combinations.items()):
+        if delta:
+            _bump(connection, CombinationStats.__table__,
+                  {'map_id': map_id, 'grenade_id': grenade_id}, delta)
+    for author_id, delta in sorted(authors.items()):
+        if delta:
+            _bump(connection, AuthorStats.__table__, {'author_id': author_id}, delta)
+
+
+@event.listens_for(Session, 'after_flush')
+def _count_video_changes(session, flush_context):
+    new, deleted, moved = [], [], []
+    for obj in session.new:
+        if isinstance(obj, Video):
+            new.append(((obj.map_id, obj.grenade_id), obj.author_id))
+    for obj in session.deleted:
+        if isinstance(obj, Video):
+            deleted.append(((_committed(obj, 'map_id'), _committed(obj, 'grenade_id')),
+                            _committed(obj, 'author_id')))
+    for obj in session.dirty:
+        if isinstance(obj, Video) and session.is_modified(obj):
+            old = ((_committed(obj, 'map_id'), _committed(obj, 'grenade_id')), _committed(obj, 'author_id'))
+            current = ((obj.map_id, obj.grenade_id), obj.author_id)
+            if old != current:
+                moved.append((old, current))
+    if new or deleted or moved:
+        apply_video_counts(session.connection(), *video_count_deltas(new, deleted, moved))
+
+
+def repair_counters():
+    """Пересчитывает счетчики по таблице videos; возвращает (комбинаций, авторов)"""
+    combinations = db.session.query(Video.map_id, Video.grenade_id, func.count()) \
+        .group_by(Video.map_id, Video.grenade_id).all()
+    authors = db.session.query(Video.author_id, func.count()).group_by(Video.author_id).all()
+
+    CombinationStats.query.delete()
+    AuthorStats.query.delete()
+    db.session.add_all(CombinationStats(map_id=map_id, grenade_id=grenade_id, video_count=count)
+                       for map_id, grenade_id, count in combinations)
+    db.session.add_all(AuthorStats(author_id=author_id, video_count=count)
+                       for author_id, count in authors)
+    db.session.commit()
+    return len(combinations), len(authors)
+
+
+def combination_counts():
+    """Словарь {(map_id, grenade_id): число видео} для непустых комбинаций"""
+    rows = db.session.query(CombinationStats.map_id, CombinationStats.grenade_id,
+                            CombinationStats.video_count) \
+        .filter(CombinationStats.video_count > 0)
+    return {(map_id, grenade_id): count for map_id, grenade_id, count in rows}
+
+
+def author_video_count(author_id):
+    """Число видео автора"""
+    count = db.session.query(AuthorStats.video_count).filter_by(author_id=author_id).scalar()
+    return count or 0
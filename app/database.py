@@ -0,0 +1,153 @@
+"""Настройка движка БД под несколько воркеров и потоков.
+
+SQLite: на каждое соединение ставятся PRAGMA из конфига — WAL (читатели
+не ждут писателя), synchronous=NORMAL (в WAL безопасно и без fsync на
+каждый коммит), busy_timeout (писатель ждет блокировку, а не падает
+с "database is locked"), cache_size и mmap_size.
+PostgreSQL и прочие: размер пула, overflow, pre-ping и recycle.
+
+Явно заданный SQLALCHEMY_ENGINE_OPTIONS перекрывает значения отсюда.
+
+Реплика для чтения (SQLALCHEMY_REPLICA_URI): RoutingSession отправляет
+запросы безопасных методов (GET, HEAD, OPTIONS) на bind 'replica', а все
+записи и остальные запросы — на основную БД. После записи пользователь
+REPLICA_READ_YOUR_WRITES_SECONDS секунд читает с основной БД, чтобы сразу
+увидеть свои изменения, даже если реплика отстает. Остальные посетители
+видят изменения, когда их получит реплика: ETag и ключ кэша страниц
+считаются в том же запросе по той же БД, что и страница, поэтому
+отстающая реплика не попадает в кэш под ключом новых данных.
+"""
+import time
+from flask import current_app, g, has_request_context, request, session as flask_session
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+
+REPLICA_BIND = 'replica'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Ключ в cookie-сессии: до какого момента читать с основной БД
+PRIMARY_UNTIL_KEY = '_db_primary_until'
+
+
+def engine_options(config):
+    """Параметры create_engine для URI из конфига"""
+    uri = config['SQLALCHEMY_DATABASE_URI']
+    if uri.startswith('sqlite'):
+        # Ожидание блокировки в драйвере (секунды) — то же, что busy_timeout
+        options = {'connect_args': {'timeout': config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+    else:
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        }
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+
+def sqlite_pragmas(config, in_memory=False):
+    """PRAGMA для нового соединения SQLite: [(имя, значение)]"""
+    pragmas = [
+        ('busy_timeout', config['SQLITE_BUSY_TIMEOUT']),
+        ('cache_size', config['SQLITE_CACHE_SIZE']),
+    ]
+    if not in_memory:
+        # У базы в памяти нет файла: ни WAL, ни mmap
+        pragmas[:0] = [('journal_mode', config['SQLITE_JOURNAL_MODE'])]
+        pragmas += [('mmap_size', config['SQLITE_MMAP_SIZE'])]
+    pragmas.append(('synchronous', config['SQLITE_SYNCHRONOUS']))
+    return [(name, value) for name, value in pragmas if value is not None]
+
+
+def _set_pragmas(pragmas, dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas:
+            cursor.execute(f'PRAGMA {name}={value}')
+    finally:
+        cursor.close()
+
+
+def init_engine_options(app):
+    """Заполняет SQLALCHEMY_ENGINE_OPTIONS до db.init_app"""
+    config = app.config
+    config.setdefault('SQLITE_JOURNAL_MODE', 'WAL')
+    config.setdefault('SQLITE_SYNCHRONOUS', 'NORMAL')
+    config.setdefault('SQLITE_BUSY_TIMEOUT', 5000)
+    config.setdefault('SQLITE_CACHE_SIZE', -20000)
+    config.setdefault('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)
+    config.setdefault('DB_POOL_SIZE', 10)
+    config.setdefault('DB_MAX_OVERFLOW', 20)
+    config.setdefault('DB_POOL_TIMEOUT', 30)
+    config.setdefault('DB_POOL_RECYCLE', 1800)
+    config.setdefault('DB_POOL_PRE_PING', True)
+    config.setdefault('SQLALCHEMY_REPLICA_URI', None)
+    config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS', 10)
+    config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(config)
+    if config['SQLALCHEMY_REPLICA_URI']:
+        binds = dict(config.get('SQLALCHEMY_BINDS') or {})
+        binds[REPLICA_BIND] = config['SQLALCHEMY_REPLICA_URI']
+        config['SQLALCHEMY_BINDS'] = binds
+
+
+def install_connect_hooks(app, engines):
+    """Вешает установку PRAGMA на новые соединения SQLite-движков (engines: {ключ: движок})"""
+    for key, engine in engines.items():
+        if engine.dialect.name != 'sqlite':
+            continue
+        in_memory = engine.url.database in (None, '', ':memory:')
+        pragmas = sqlite_pragmas(app.config, in_memory=in_memory)
+        if key == REPLICA_BIND:
+            # Случайная запись в реплику — ошибка, а не расхождение данных
+            pragmas.append(('query_only', 'ON'))
+        event.listen(engine, 'connect', lambda *args, pragmas=pragmas: _set_pragmas(pragmas, *args))
+
+
+def _read_from_replica():
+    """Можно ли текущему запросу читать с реплики"""
+    return has_request_context() and g.get('db_read_replica', False)
+
+
+class RoutingSession(FlaskSession):
+    """Сессия, которая отправляет чтение безопасных запросов на реплику"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and not self.info.get('wrote') \
+                and not getattr(clause, 'is_dml', False) and _read_from_replica():
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_write(session, flush_context):
+    # После записи и чтение в этой сессии идет с основной БД
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _remember_write(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        window = current_app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+        if current_app.config['SQLALCHEMY_REPLICA_URI'] and window:
+            flask_session[PRIMARY_UNTIL_KEY] = time.time() + window
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_write(session):
+    session.info.pop('wrote', None)
+
+
+def init_replica_routing(app):
+    """Решает в начале запроса, читать ли ему с реплики"""
+    if not app.config['SQLALCHEMY_REPLICA_URI']:
+        return
+
+    @app.before_request
+    def choose_database():
+        g.db_read_replica = (
+            request.method in SAFE_METHODS
+            and flask_session.get(PRIMARY_UNTIL_KEY, 0) < time.time()
+        )
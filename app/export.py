@@ -0,0 +1,166 @@
+"""Потоковый экспорт ссылок на видео.
+
+Строки читаются из БД порциями (yield_per) и сразу отдаются клиенту,
+поэтому экспорт целой карты или всего каталога не держит данные в памяти.
+"""
+import csv
+import io
+import json
+from datetime import datetime
+from app import db
+from app.models import User, Video
+
+# Сколько строк забирать из курсора за раз
+EXPORT_BATCH_SIZE = 500
+
+# Размер куска ответа, который отдается серверу за один yield
+CHUNK_SIZE = 64 * 1024
+
+EXPORT_FORMATS = {
+    'txt': ('text/plain', 'txt'),
+    'csv': ('text/csv', 'csv'),
+    'json': ('application/json', 'json'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+}
+
+CSV_FIELDS = ['id', 'title', 'url', 'description', 'author', 'map', 'grenade', 'created_at']
+
+
+def export_query(map_id=None, grenade_id=None):
+    """Проекция видео для экспорта (без загрузки ORM-объектов)"""
+    query = db.session.query(
+        Video.id,
+        Video.title,
+        Video.description,
+        Video.video_url,
+        Video.created_at,
+        Video.map_id,
+        Video.grenade_id,
+        User.username.label('author')
+    ).join(User, Video.author_id == User.id)
+    if map_id:
+        query = query.filter(Video.map_id == map_id)
+    if grenade_id:
+        query = query.filter(Video.grenade_id == grenade_id)
+    # Порядок совпадает с индексом ix_videos_map_grenade_created
+    return query.order_by(Video.map_id, Video.grenade_id, Video.created_at.desc(), Video.id.desc())
+
+
+def _stream_rows(query):
+    # yield_per включает серверный курсор (stream_results) там, где он есть
+    return query.yield_per(EXPORT_BATCH_SIZE)
+
+
+def _chunked(parts):
+    """Склеивает мелкие строки в куски по CHUNK_SIZE и кодирует в UTF-8"""
+    buffer = []
+    size = 0
+    for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+class VideoExport:
+    """Экспорт набора видео: одна комбинация, вся карта или весь каталог"""
+
+    def __init__(self, maps, grenades, map_obj=None, grenade_obj=None):
+        # maps/grenades — словари id -> объект для подписи строк
+        self.maps = maps
+        self.grenades = grenades
+        self.map_obj = map_obj
+        self.grenade_obj = grenade_obj
+
+    def query(self):
+        return export_query(
+            map_id=self.map_obj.id if self.map_obj else None,
+            grenade_id=self.grenade_obj.id if self.grenade_obj else None
+        )
+
+    def filename(self, fmt):
+        parts = ['grenadeguide']
+        if self.map_obj:
+            parts.append(self.map_obj.name)
+            if self.grenade_obj:
+                parts.append(self.grenade_obj.name)
+        else:
+            parts.append('all')
+        parts.append(datetime.now().strftime('%Y%m%d_%H%M'))
+        return f"{'_'.join(parts)}.{EXPORT_FORMATS[fmt][1]}"
+
+    def _as_dict(self, row):
+        return {
+            'id': row.id,
+            'title': row.title,
+            'url': row.video_url,
+            'description': row.description,
+            'author': row.author,
+            'map': self.maps[row.map_id].name,
+            'grenade': self.grenades[row.grenade_id].name,
+            'created_at': row.created_at.isoformat() if row.created_at else None,
+        }
+
+    def generate(self, fmt):
+        """Генератор байтовых кусков ответа в нужном формате"""
+        return _chunked(getattr(self, f'_generate_{fmt}')())
+
+    def _generate_txt(self):
+        total = self.query().order_by(None).count()
+        map_name = self.map_obj.display_name if self.map_obj else 'все'
+        grenade_name = self.grenade_obj.display_name if self.grenade_obj else 'все'
+        yield f"""GrenadeGuide - Экспорт ссылок на видео
+Карта: {map_name}
+Граната: {grenade_name}
+Дата экспорта: {datetime.now().strftime('%d.%m.%Y %H:%M')}
+Количество видео: {total}
+
+Ссылки на видео:
+{"="*50}
+
+"""
+        single_combination = self.map_obj is not None and self.grenade_obj is not None
+        combination = None
+        count = 0
+        for row in _stream_rows(self.query()):
+            # При экспорте нескольких комбинаций разделяем их заголовками
+            if not single_combination and combination != (row.map_id, row.grenade_id):
+                combination = (row.map_id, row.grenade_id)
+                yield (f"\n## {self.maps[row.map_id].display_name} / "
+                       f"{self.grenades[row.grenade_id].display_name}\n\n")
+            count += 1
+            yield f"{count}. {row.title}\n"
+            yield f"   Ссылка: {row.video_url}\n"
+            if row.description:
+                yield f"   Описание: {row.description}\n"
+            yield f"   Автор: {row.author}\n"
+            yield f"   Добавлено: {row.created_at.strftime('%d.%m.%Y')}\n"
+            yield "-" * 30 + "\n"
+        yield f"\nВсего видео: {count}"
+
+    def _generate_csv(self):
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for row in _stream_rows(self.query()):
+            writer.writerow(self._as_dict(row))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+
+    def _generate_json(self):
+        yield '['
+        separator = '\n'
+        for row in _stream_rows(self.query()):
+            yield separator + json.dumps(self._as_dict(row), ensure_ascii=False)
+            separator = ',\n'
+        yield '\n]\n'
+
+    def _generate_ndjson(self):
+        for row in _stream_rows(self.query()):
+            yield json.dumps(self._as_dict(row), ensure_ascii=False) + '\n'
@@ -1,7 +1,9 @@
 from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, SubmitField, BooleanField, SelectField, TextAreaField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, URL
-from app.models import User, Map, Grenade
+from app.models import User, Video
+from app.utils import extract_youtube_id
+from app import reference_data
 
 class LoginForm(FlaskForm):
     username = StringField('Имя пользователя', validators=[DataRequired()])
@@ -30,6 +32,18 @@ class RegistrationForm(FlaskForm):
         if user is not None:
             raise ValidationError('Этот email уже используется.')
         
+def _check_duplicate_video(video_url, exclude_id=None):
+    """Ошибка валидации, если это YouTube-видео уже есть в базе (поиск по индексу youtube_id)"""
+    youtube_id = extract_youtube_id(video_url.data)
+    if youtube_id is None:
+        return
+    query = Video.query.filter_by(youtube_id=youtube_id)
+    if exclude_id is not None:
+        query = query.filter(Video.id != exclude_id)
+    existing = query.first()
+    if existing is not None:
+        raise ValidationError(f'Это видео уже добавлено: «{existing.title}».')
+
 class VideoForm(FlaskForm):
     """Форма добавления видео"""
     title = StringField('Название видео', 
@@ -54,9 +68,12 @@ class VideoForm(FlaskForm):
     
     def __init__(self, *args, **kwargs):
         super(VideoForm, self).__init__(*args, **kwargs)
-        # Динамически заполняем выбор карт и гранат из базы данных
-        self.map_id.choices = [(map.id, map.display_name) for map in Map.query.order_by('display_name').all()]
-        self.grenade_id.choices = [(grenade.id, grenade.display_name) for grenade in Grenade.query.order_by('display_name').all()]
+        # Заполняем выбор карт и гранат из кэша справочников
+        self.map_id.choices = reference_data.map_choices()
+        self.grenade_id.choices = reference_data.grenade_choices()
+
+    def validate_video_url(self, video_url):
+        _check_duplicate_video(video_url)
 
 class EditVideoForm(FlaskForm):
     """Форма редактирования видео"""
@@ -81,8 +98,13 @@ class EditVideoForm(FlaskForm):
     
     submit = SubmitField('Сохранить изменения')
     
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, video_id=None, **kwargs):
         super(EditVideoForm, self).__init__(*args, **kwargs)
-        # Динамически заполняем выбор карт и гранат из базы данных
-        self.map_id.choices = [(map.id, map.display_name) for map in Map.query.order_by('display_name').all()]
-        self.grenade_id.choices = [(grenade.id, grenade.display_name) for grenade in Grenade.query.order_by('display_name').all()]
\ No newline at end of file
+        # id редактируемого видео: совпадение с самим собой — не дубликат
+        self.video_id = video_id
+        # Заполняем выбор карт и гранат из кэша справочников
+        self.map_id.choices = reference_data.map_choices()
+        self.grenade_id.choices = reference_data.grenade_choices()
+
+    def validate_video_url(self, video_url):
+        _check_duplicate_video(video_url, exclude_id=self.video_id)
\ No newline at end of file
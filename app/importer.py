@@ -0,0 +1,167 @@
+"""Массовый импорт раскидок из CSV, JSON и NDJSON.
+
+Записи читаются потоком, карта и граната ищутся по name в справочниках
+(reference_data), дубликаты отсекаются по YouTube ID: внутри файла — по
+множеству уже встреченных, с базой — одним запросом по индексу на пачку.
+Видео вставляются пачками через Core insert(): один executemany и одна
+транзакция на пачку.
+ORM-события при этом не срабатывают, поэтому номера ленты изменений и
+счетчики пачка выставляет сама.
+"""
+import csv
+import json
+import time
+from sqlalchemy import insert
+from app import db, reference_data
+from app.models import User, Video
+from app.utils import extract_youtube_id, get_youtube_thumbnail
+from app.changes import allocate_change_seq
+from app.counters import video_count_deltas, apply_video_counts
+
+IMPORT_FORMATS = ('csv', 'json', 'ndjson')
+
+
+class InvalidRecord(ValueError):
+    """Запись, которую нельзя импортировать"""
+
+
+def read_records(stream, fmt):
+    """Записи (словари) из текстового потока в формате fmt"""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'ndjson':
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    elif fmt == 'json':
+        # JSON-массив без потокового парсера читается целиком
+        yield from json.load(stream)
+    else:
+        raise ValueError(f'Неизвестный формат: {fmt}')
+
+
+def existing_youtube_ids(youtube_ids):
+    """Какие из youtube_ids уже есть в базе"""
+    rows = db.session.query(Video.youtube_id).filter(Video.youtube_id.in_(youtube_ids))
+    return {youtube_id for (youtube_id,) in rows}
+
+
+class ImportStats:
+    """Итоги импорта"""
+
+    def __init__(self):
+        self.inserted = 0
+        self.duplicates = 0
+        self.errors = []
+        self.started = time.perf_counter()
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    @property
+    def rate(self):
+        return self.inserted / self.elapsed if self.elapsed else 0.0
+
+
+class VideoImporter:
+    """Импорт видео пачками по chunk_size от имени автора author"""
+
+    def __init__(self, author, chunk_size=500, on_chunk=None):
+        self.author = author
+        self.chunk_size = chunk_size
+        self.on_chunk = on_chunk
+        self.stats = ImportStats()
+        self.seen = set()
+
+    @staticmethod
+    def _text(record, *keys):
+        """Первое непустое строковое поле записи ('' если нет)"""
+        for key in keys:
+            value = record.get(key)
+            if value is None or value == '':
+                continue
+            if not isinstance(value, str):
+                raise InvalidRecord(f'поле {key} — не строка: {value!r}')
+            return value.strip()
+        return ''
+
+    def _row(self, record):
+        """Строка для вставки из записи или InvalidRecord"""
+        # В JSON-массиве может оказаться что угодно, а не только объект
+        if not isinstance(record, dict):
+            raise InvalidRecord(f'запись не объект: {type(record).__name__}')
+        title = self._text(record, 'title')
+        url = self._text(record, 'url', 'video_url')
+        map_ref = reference_data.map_by_name(self._text(record, 'map'))
+        grenade_ref = reference_data.grenade_by_name(self._text(record, 'grenade'))
+        if not title:
+            raise InvalidRecord('нет названия')
+        if map_ref is None:
+            raise InvalidRecord(f"неизвестная карта {record.get('map')!r}")
+        if grenade_ref is None:
+            raise InvalidRecord(f"неизвестная граната {record.get('grenade')!r}")
+        youtube_id = extract_youtube_id(url)
+        if youtube_id is None:
+            raise InvalidRecord(f'не ссылка на YouTube: {url!r}')
+        return youtube_id, {
+            'youtube_id': youtube_id,
+            'title': title[:200],
+            'description': self._text(record, 'description') or None,
+            'video_url': url,
+            'thumbnail_url': get_youtube_thumbnail(url, quality='hqdefault'),
+            'author_id': self.author.id,
+            'map_id': map_ref.id,
+            'grenade_id': grenade_ref.id,
+        }
+
+    def _flush(self, rows):
+        """Вставляет пачку в отдельной транзакции"""
+        existing = existing_youtube_ids([row['youtube_id'] for row in rows])
+        if existing:
+            self.stats.duplicates += len(existing)
+            rows = [row for row in rows if row['youtube_id'] not in existing]
+            if not rows:
+                return
+        connection = db.session.connection()
+        first_seq = allocate_change_seq(connection, len(rows))
+        for offset, row in enumerate(rows):
+            row['change_seq'] = first_seq + offset
+        db.session.execute(insert(Video.__table__), rows)
+        apply_video_counts(connection, *video_count_deltas(
+            new=[((row['map_id'], row['grenade_id']), row['author_id']) for row in rows]
+        ))
+        db.session.commit()
+        self.stats.inserted += len(rows)
+        if self.on_chunk:
+            self.on_chunk(self.stats)
+
+    def run(self, records):
+        """Импортирует записи; возвращает ImportStats"""
+        rows = []
+        for number, record in enumerate(records, start=1):
+            try:
+                youtube_id, row = self._row(record)
+            except InvalidRecord as error:
+                self.stats.errors.append((number, str(error)))
+                continue
+            if youtube_id in self.seen:
+                self.stats.duplicates += 1
+                continue
+            self.seen.add(youtube_id)
+            rows.append(row)
+            if len(rows) >= self.chunk_size:
+                self._flush(rows)
+                rows = []
+        if rows:
+            self._flush(rows)
+        return self.stats
+
+
+def import_videos(stream, fmt, author_username, chunk_size=500, on_chunk=None):
+    """Импорт из потока; автор ищется по имени пользователя"""
+    author = User.query.filter_by(username=author_username).first()
+    if author is None:
+        raise ValueError(f'Пользователь {author_username!r} не найден')
+    importer = VideoImporter(author, chunk_size=chunk_size, on_chunk=on_chunk)
+    return importer.run(read_records(stream, fmt))
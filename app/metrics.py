@@ -0,0 +1,347 @@
+"""Метрики запросов: время ответа, SQL и шаблоны.
+
+Включается METRICS_ENABLED. Для каждого запроса считается общее время,
+число SQL-запросов и их суммарное время (события before/after_cursor_execute
+всех движков, включая реплику) и время рендера шаблонов. Итог уходит
+в гистограммы по эндпоинтам, доступные в текстовом формате Prometheus
+на /metrics, и в заголовок Server-Timing ответа (видно в DevTools).
+Потоковые ответы (экспорт) учитываются целиком при закрытии ответа,
+но без Server-Timing: заголовки уходят до чтения тела.
+
+Запросы дольше METRICS_SLOW_QUERY_MS пишутся в лог вместе с параметрами.
+
+У каждого процесса свои счетчики. С несколькими воркерами gunicorn задайте
+METRICS_DIR: воркеры раз в METRICS_FLUSH_SECONDS сбрасывают снимок в файл,
+а /metrics суммирует файлы всех воркеров.
+"""
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from flask import current_app, g, has_request_context, request, abort, before_render_template, template_rendered
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+PREFIX = 'grenade_guide_'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Имя: (тип, описание)
+METRICS = {
+    'http_requests_total': ('counter', 'Ответы по эндпоинту, методу и статусу'),
+    'http_request_duration_seconds': ('histogram', 'Время обработки запроса'),
+    'db_queries_total': ('counter', 'SQL-запросы по эндпоинту'),
+    'db_request_duration_seconds': ('histogram', 'Суммарное время SQL за запрос'),
+    'db_slow_queries_total': ('counter', 'SQL-запросы дольше METRICS_SLOW_QUERY_MS'),
+    'template_render_duration_seconds': ('histogram', 'Время рендера шаблона'),
+    'cache_hits_total': ('counter', 'Попадания в кэш'),
+    'cache_misses_total': ('counter', 'Промахи кэша'),
+    'cache_evictions_total': ('counter', 'Вытеснения из кэша'),
+    'cache_entries': ('gauge', 'Записей в кэше'),
+}
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels) + '}'
+
+
+class MetricsRegistry:
+    """Потокобезопасные счетчики и гистограммы одного процесса"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters = {}    # (имя, метки) -> значение
+        self._histograms = {}  # (имя, метки) -> [счетчики корзин..., +Inf, сумма]
+
+    def inc(self, name, labels=(), amount=1):
+        key = (name, tuple(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        key = (name, tuple(labels))
+        with self._lock:
+            row = self._histograms.get(key)
+            if row is None:
+                row = self._histograms[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[bisect_left(self.buckets, value)] += 1
+            row[-1] += value
+
+    def snapshot(self):
+        """Копия значений в виде, пригодном для JSON"""
+        with self._lock:
+            return {
+                'buckets': list(self.buckets),
+                'counters': [[name, list(labels), value] for (name, labels), value in self._counters.items()],
+                'histograms': [[name, list(labels), list(row)] for (name, labels), row in self._histograms.items()],
+            }
+
+
+def merge_snapshots(snapshots):
+    """Суммирует снимки нескольких процессов (корзины должны совпадать)"""
+    counters, histograms, buckets = {}, {}, None
+    for snapshot in snapshots:
+        if buckets is not None and snapshot['buckets'] != buckets:
+            continue
+        buckets = snapshot['buckets']
+        for name, labels, value in snapshot['counters']:
+            key = (name, tuple(tuple(label) for label in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, row in snapshot['histograms']:
+            key = (name, tuple(tuple(label) for label in labels))
+            total = histograms.setdefault(key, [0] * len(row))
+            histograms[key] = [a + b for a, b in zip(total, row)]
+    return {'buckets': buckets or list(DEFAULT_BUCKETS), 'counters': counters, 'histograms': histograms}
+
+
+def render_prometheus(merged, gauges=()):
+    """Текстовый формат Prometheus (version 0.0.4)"""
+    series = {}  # имя -> [(метки, строки)]
+    for (name, labels), value in merged['counters'].items():
+        series.setdefault(name, []).append((labels, [f'{PREFIX}{name}{_format_labels(labels)} {value:g}']))
+    for name, labels, value in gauges:
+        series.setdefault(name, []).append((labels, [f'{PREFIX}{name}{_format_labels(labels)} {value:g}']))
+    for (name, labels), row in merged['histograms'].items():
+        lines = []
+        cumulative = 0
+        for bound, count in zip(list(merged['buckets']) + ['+Inf'], row[:-1]):
+            cumulative += count
+            le = bound if isinstance(bound, str) else f'{bound:g}'
+            lines.append(f'{PREFIX}{name}_bucket{_format_labels(labels + (("le", le),))} {cumulative}')
+        lines.append(f'{PREFIX}{name}_sum{_format_labels(labels)} {row[-1]:.6f}')
+        lines.append(f'{PREFIX}{name}_count{_format_labels(labels)} {cumulative}')
+        series.setdefault(name, []).append((labels, lines))
+
+    output = []
+    for name in sorted(series):
+        kind, help_text = METRICS.get(name, ('untyped', name))
+        output.append(f'# HELP {PREFIX}{name} {help_text}')
+        output.append(f'# TYPE {PREFIX}{name} {kind}')
+        for labels, lines in sorted(series[name], key=lambda item: item[0]):
+            output.extend(lines)
+    return '\n'.join(output) + '\n'
+
+
+class RequestTimings:
+    """Замеры одного запроса (лежит в g)"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.db_time = 0.0
+        self.db_count = 0
+        self.template_time = 0.0
+        self.template_starts = []
+
+    def server_timing(self, total):
+        return (f'app;dur={total * 1000:.1f}, '
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries", '
+                f'tpl;dur={self.template_time * 1000:.1f}')
+
+
+def _timings():
+    return g.get('request_timings') if has_request_context() else None
+
+
+class _MetricsState:
+    def __init__(self, app):
+        self.registry = MetricsRegistry(app.config['METRICS_BUCKETS'])
+        self.slow_query_seconds = (app.config['METRICS_SLOW_QUERY_MS'] or 0) / 1000
+        self.directory = app.config['METRICS_DIR']
+        self.flush_seconds = app.config['METRICS_FLUSH_SECONDS']
+        self.flushed_at = 0.0
+        self.flush_lock = threading.Lock()
+
+    def maybe_flush(self, force=False):
+        """Сбрасывает снимок процесса в METRICS_DIR не чаще раза в flush_seconds"""
+        if not self.directory:
+            return
+        now = time.monotonic()
+        if not force and now - self.flushed_at < self.flush_seconds:
+            return
+        if not self.flush_lock.acquire(blocking=False):
+            return
+        try:
+            self.flushed_at = now
+            os.makedirs(self.directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(self.registry.snapshot(), f)
+            os.replace(tmp_path, os.path.join(self.directory, f'{os.getpid()}.json'))
+        finally:
+            self.flush_lock.release()
+
+    def collect(self):
+        """Снимки всех процессов (или только текущего без METRICS_DIR)"""
+        if not self.directory:
+            return [self.registry.snapshot()]
+        self.maybe_flush(force=True)
+        snapshots = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.json'):
+                continue
+            try:
+                with open(os.path.join(self.directory, name), encoding='utf-8') as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+class Metrics:
+    """Метрики запросов и /metrics (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', False)
+        app.config.setdefault('METRICS_SERVER_TIMING', True)
+        app.config.setdefault('METRICS_SLOW_QUERY_MS', 200)
+        app.config.setdefault('METRICS_BUCKETS', DEFAULT_BUCKETS)
+        # Токен для /metrics (Authorization: Bearer ...); None — без проверки
+        app.config.setdefault('METRICS_TOKEN', None)
+        app.config.setdefault('METRICS_DIR', None)
+        app.config.setdefault('METRICS_FLUSH_SECONDS', 5)
+        if not app.config['METRICS_ENABLED']:
+            app.extensions['metrics'] = None
+            return
+
+        state = app.extensions['metrics'] = _MetricsState(app)
+        from app import db
+        with app.app_context():
+            for engine in db.engines.values():
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute',
+                             lambda *args, state=state: _after_cursor_execute(state, *args))
+        before_render_template.connect(_before_render, app, weak=False)
+        template_rendered.connect(_after_render, app, weak=False)
+        app.before_request(_start_request)
+        app.after_request(_finish_request)
+        app.add_url_rule('/metrics', 'metrics', metrics_view)
+
+    @property
+    def state(self):
+        return current_app.extensions['metrics']
+
+    def snapshot(self):
+        """Сумма счетчиков всех процессов или None, если метрики выключены"""
+        state = self.state
+        return merge_snapshots(state.collect()) if state is not None else None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info['metrics_query_started'] = time.perf_counter()
+
+
+def _after_cursor_execute(state, conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('metrics_query_started', None)
+    if started is None:
+        return
+    elapsed = time.perf_counter() - started
+    timings = _timings()
+    if timings is not None:
+        timings.db_time += elapsed
+        timings.db_count += 1
+    if state.slow_query_seconds and elapsed >= state.slow_query_seconds:
+        endpoint = request.endpoint if has_request_context() else None
+        state.registry.inc('db_slow_queries_total', (('endpoint', endpoint or '-'),))
+        logger.warning('Медленный запрос %.1f мс (%s): %s; параметры: %.500r',
+                       elapsed * 1000, endpoint or 'вне запроса', statement, parameters)
+
+
+def _before_render(sender, template, context, **extra):
+    timings = _timings()
+    if timings is not None:
+        timings.template_starts.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    timings = _timings()
+    if timings is None or not timings.template_starts:
+        return
+    elapsed = time.perf_counter() - timings.template_starts.pop()
+    # Вложенный render_template уже учтен во внешнем
+    if not timings.template_starts:
+        timings.template_time += elapsed
+    sender.extensions['metrics'].registry.observe(
+        'template_render_duration_seconds', (('template', template.name or '-'),), elapsed)
+
+
+def _start_request():
+    g.request_timings = RequestTimings()
+
+
+def _record_request(state, timings, endpoint, method, status):
+    total = time.perf_counter() - timings.started
+    registry = state.registry
+    labels = (('endpoint', endpoint), ('method', method))
+    registry.inc('http_requests_total', labels + (('status', status),))
+    registry.observe('http_request_duration_seconds', labels, total)
+    registry.inc('db_queries_total', (('endpoint', endpoint),), timings.db_count)
+    registry.observe('db_request_duration_seconds', (('endpoint', endpoint),), timings.db_time)
+    state.maybe_flush()
+    return total
+
+
+def _finish_request(response):
+    # Не pop: потоковое тело читается после этого хука и еще пишет замеры в g
+    timings = g.get('request_timings')
+    if timings is None:
+        return response
+    state = current_app.extensions['metrics']
+    # Несовпавшие адреса под одной меткой, чтобы сканеры не раздували число рядов
+    args = (state, timings, request.endpoint or '<unmatched>', request.method, str(response.status_code))
+    if response.is_streamed:
+        # Запросы экспорта выполняются при отдаче тела, поэтому итог — при закрытии
+        # ответа; заголовки к этому времени уже отправлены, и Server-Timing нет
+        response.call_on_close(lambda: _record_request(*args))
+        return response
+    total = _record_request(*args)
+    if current_app.config['METRICS_SERVER_TIMING']:
+        response.headers['Server-Timing'] = timings.server_timing(total)
+    return response
+
+
+def _cache_gauges():
+    """Статистика кэшей текущего процесса: [(имя, метки, значение)]"""
+    from app import user_cache, page_cache
+
+    caches = {'users': user_cache.stats()}
+    backend = page_cache.backend
+    if backend is not None:
+        caches['pages'] = backend.stats()
+    gauges = []
+    for cache, stats in caches.items():
+        if not stats:
+            continue
+        labels = (('cache', cache), ('pid', str(os.getpid())))
+        for key, name in (('hits', 'cache_hits_total'), ('misses', 'cache_misses_total'),
+                          ('evictions', 'cache_evictions_total'), ('size', 'cache_entries'),
+                          ('files', 'cache_entries')):
+            if key in stats:
+                gauges.append((name, labels, stats[key]))
+    return gauges
+
+
+def metrics_view():
+    """Метрики в текстовом формате Prometheus"""
+    token = current_app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        abort(403)
+    state = current_app.extensions['metrics']
+    body = render_prometheus(merge_snapshots(state.collect()), _cache_gauges())
+    response = current_app.response_class(body, mimetype='text/plain')
+    response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+    response.cache_control.no_store = True
+    return response
@@ -2,7 +2,8 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from datetime import datetime
 from app import db
-from app.utils import get_youtube_thumbnail
+from sqlalchemy.orm import validates
+from app.utils import extract_youtube_id, get_youtube_thumbnail, get_youtube_embed_url
 
 
 class User(UserMixin, db.Model):
@@ -59,8 +60,11 @@ class Video(db.Model):
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text)
     video_url = db.Column(db.String(500), nullable=False)  # ссылка на YouTube и т.д.
+    youtube_id = db.Column(db.String(32), unique=True, index=True)  # ID из video_url, для поиска дубликатов
     thumbnail_url = db.Column(db.String(500))  # превью видео
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    thumbnail_hash = db.Column(db.String(64))  # SHA-256 локальной копии превью (см. app/thumbnails.py)
+    thumbnail_status = db.Column(db.String(16))  # None — не проверено, 'ok', 'missing', 'error' (повторить)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # ключ курсора (app/pagination.py)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Внешние ключи
@@ -68,11 +72,83 @@ class Video(db.Model):
     map_id = db.Column(db.Integer, db.ForeignKey('maps.id'), nullable=False)
     grenade_id = db.Column(db.Integer, db.ForeignKey('grenades.id'), nullable=False)
     
+    # Номер последнего изменения для ленты изменений (см. app/changes.py)
+    change_seq = db.Column(db.BigInteger, index=True)
+    
+    # Индексы под основные выборки (см. app/queries.py и `flask check-query-plans`)
+    __table_args__ = (
+        db.Index('ix_videos_map_grenade_created', 'map_id', 'grenade_id', created_at.desc(), id.desc()),
+        db.Index('ix_videos_author_created', 'author_id', created_at.desc()),
+        db.Index('ix_videos_map_grenade_updated', 'map_id', 'grenade_id', 'updated_at'),
+        db.Index('ix_videos_map_grenade_change', 'map_id', 'grenade_id', 'change_seq'),
+    )
+    
     def __repr__(self):
         return f'<Video {self.title}>'
     
+    @property
+    def embed_url(self):
+        """Ссылка для встраивания плеера"""
+        return get_youtube_embed_url(self.video_url)
+    
     def __init__(self, **kwargs):
         super(Video, self).__init__(**kwargs)
         # АВТОМАТИЧЕСКИ ГЕНЕРИРУЕМ ПРЕВЬЮ ПРИ СОЗДАНИИ ОБЪЕКТА
         if self.video_url and not self.thumbnail_url:
-            self.thumbnail_url = get_youtube_thumbnail(self.video_url, quality='hqdefault')
\ No newline at end of file
+            self.thumbnail_url = get_youtube_thumbnail(self.video_url, quality='hqdefault')
+
+    @validates('video_url')
+    def _set_youtube_id(self, key, video_url):
+        # youtube_id всегда соответствует текущей ссылке
+        youtube_id = extract_youtube_id(video_url)
+        if youtube_id != self.youtube_id:
+            self.youtube_id = youtube_id
+            # Локальное превью было от другого видео
+            self.thumbnail_hash = None
+            self.thumbnail_status = None
+        return video_url
+
+class VideoTombstone(db.Model):
+    """Запись об удалении видео (или переносе в другую комбинацию) для ленты изменений"""
+    __tablename__ = 'video_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    video_id = db.Column(db.Integer, nullable=False)
+    map_id = db.Column(db.Integer, nullable=False)
+    grenade_id = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)
+    change_seq = db.Column(db.BigInteger, nullable=False, index=True)
+    
+    def __repr__(self):
+        return f'<VideoTombstone {self.video_id}>'
+
+class ChangeSequence(db.Model):
+    """Именованные монотонные счетчики"""
+    __tablename__ = 'change_sequences'
+    
+    name = db.Column(db.String(64), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<ChangeSequence {self.name}={self.value}>'
+
+class CombinationStats(db.Model):
+    """Число видео по карте и гранате (поддерживается app/counters.py)"""
+    __tablename__ = 'combination_stats'
+    
+    map_id = db.Column(db.Integer, db.ForeignKey('maps.id'), primary_key=True)
+    grenade_id = db.Column(db.Integer, db.ForeignKey('grenades.id'), primary_key=True)
+    video_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<CombinationStats {self.map_id}/{self.grenade_id}={self.video_count}>'
+
+class AuthorStats(db.Model):
+    """Число видео автора (поддерживается app/counters.py)"""
+    __tablename__ = 'author_stats'
+    
+    author_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    video_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<AuthorStats {self.author_id}={self.video_count}>'
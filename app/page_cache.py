@@ -0,0 +1,212 @@
+"""Кэш отрендеренных страниц и фрагментов списка видео.
+
+Для анонимных посетителей /videos и /videos/fragment выглядят одинаково,
+поэтому готовый HTML хранится по ключу (map_id, grenade_id, страница).
+В ключ входит ETag валидатора комбинации (MAX(updated_at), COUNT(*),
+отпечаток шаблонов — см. app.conditional): он считается по БД, поэтому
+после add_video, edit_video или delete_video в любом воркере старые
+страницы перестают находиться во всех процессах сразу. При чтении с реплики
+валидатор и страница берутся с нее же, и ключ не опережает содержимое.
+
+Бэкенды: 'memory' (LRU в памяти процесса) и 'filesystem' (общий каталог,
+который видят все воркеры на машине). Можно указать и свой класс.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import time
+from functools import wraps
+from flask import current_app, g, request, session, make_response
+from flask_login import current_user
+from app.cache import TTLCache
+
+
+class MemoryBackend:
+    """LRU-кэш в памяти процесса"""
+
+    def __init__(self, app):
+        self._cache = TTLCache(app.config['PAGE_CACHE_SIZE'], app.config['PAGE_CACHE_TTL'])
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class FileSystemBackend:
+    """Кэш в файлах: по файлу на ключ, запись атомарная через os.replace"""
+
+    # Как часто (в записях) удалять просроченные файлы
+    PRUNE_EVERY = 200
+
+    def __init__(self, app):
+        self.directory = app.config['PAGE_CACHE_DIR']
+        self.ttl = app.config['PAGE_CACHE_TTL']
+        self._writes = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest())
+
+    def get(self, key):
+        try:
+            with open(self._path(key), encoding='utf-8') as f:
+                expires, value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if expires < time.time():
+            self._remove(self._path(key))
+            return None
+        return value
+
+    def set(self, key, value):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump([time.time() + self.ttl, value], f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self.prune()
+
+    def prune(self):
+        """Удаляет просроченные файлы; возвращает число удаленных"""
+        # Сюда попадают и ключи старых версий данных и шаблонов: их больше
+        # никто не запросит. Файл пишется целиком, поэтому время изменения — время записи
+        deadline = time.time() - self.ttl
+        removed = 0
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                expired = os.path.getmtime(path) < deadline
+            except OSError:
+                continue
+            if expired and self._remove(path):
+                removed += 1
+        return removed
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def clear(self):
+        for name in os.listdir(self.directory):
+            self._remove(os.path.join(self.directory, name))
+
+    def stats(self):
+        return {'files': len(os.listdir(self.directory))}
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'filesystem': FileSystemBackend,
+}
+
+
+class PageCache:
+    """Кэш страниц списка видео (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # None отключает кэш; иначе имя из BACKENDS или класс бэкенда
+        app.config.setdefault('PAGE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('PAGE_CACHE_TTL', 300)
+        app.config.setdefault('PAGE_CACHE_SIZE', 512)
+        app.config.setdefault('PAGE_CACHE_DIR', os.path.join(app.instance_path, 'page_cache'))
+
+        backend = app.config['PAGE_CACHE_BACKEND']
+        if isinstance(backend, str):
+            backend = BACKENDS[backend]
+        app.extensions['page_cache'] = backend(app) if backend else None
+
+    @property
+    def backend(self):
+        return current_app.extensions['page_cache']
+
+    def page_key(self, map_id, grenade_id, etag, page):
+        """Ключ страницы по ETag валидатора комбинации.
+
+        Ключ вычисляется до рендера: если во время рендера комбинацию
+        изменят, результат запишется под старым ETag и не будет найден.
+        В ETag входит и отпечаток шаблонов, так что после деплоя старый HTML не отдается.
+        """
+        return f'page:{map_id}:{grenade_id}:{etag}:{page}'
+
+    def get(self, key):
+        return self.backend.get(key) if self.backend is not None else None
+
+    def set(self, key, value):
+        if self.backend is not None:
+            self.backend.set(key, value)
+
+    def clear(self):
+        if self.backend is not None:
+            self.backend.clear()
+
+    def prune(self):
+        """Удаляет просроченные записи, если бэкенд сам их не вытесняет"""
+        prune = getattr(self.backend, 'prune', None)
+        return prune() if prune is not None else 0
+
+
+def _request_is_cacheable():
+    # Авторизованным показываем кнопки управления, а неотданные flash-сообщения
+    # попали бы в кэш, поэтому кэшируем только "чистые" анонимные запросы
+    return request.method == 'GET' and not current_user.is_authenticated and not session.get('_flashes')
+
+
+def cached_listing(view):
+    """Кэширует ответ списка видео для анонимных посетителей"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app import page_cache
+
+        map_id = request.args.get('map', type=int)
+        grenade_id = request.args.get('grenade', type=int)
+        if page_cache.backend is None or not map_id or not grenade_id or not _request_is_cacheable():
+            return view(*args, **kwargs)
+        # Валидатор уже посчитан декоратором conditional; без него считаем сами
+        validator = g.get('validator')
+        if validator is None:
+            from app.conditional import listing_validator
+            validator = listing_validator()
+
+        # Страница определяется эндпоинтом, курсором и размером страницы
+        page = '|'.join([
+            request.endpoint,
+            request.args.get('after', ''),
+            request.args.get('before', ''),
+            request.args.get('per_page', ''),
+        ])
+        key = page_cache.page_key(map_id, grenade_id, validator.etag, page)
+        cached = page_cache.get(key)
+        if cached is not None:
+            response = make_response(cached['body'])
+            response.headers.update(cached['headers'])
+            response.headers['X-Page-Cache'] = 'HIT'
+            response.vary.add('Cookie')
+            return response
+
+        response = make_response(view(*args, **kwargs))
+        if response.status_code == 200 and not response.direct_passthrough:
+            headers = {name: value for name, value in response.headers.items()
+                       if name in ('Content-Type', 'X-Next-Cursor')}
+            page_cache.set(key, {'body': response.get_data(as_text=True), 'headers': headers})
+        response.headers['X-Page-Cache'] = 'MISS'
+        response.vary.add('Cookie')
+        return response
+    return wrapper
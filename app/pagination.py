@@ -0,0 +1,88 @@
+"""Курсорная (keyset) пагинация видео по ключу (created_at, id).
+
+В отличие от OFFSET стоимость любой страницы одинакова: запрос начинает
+чтение индекса прямо с позиции курсора и читает не больше per_page + 1 строк.
+Колонка created_at — NOT NULL (миграция d5f1a3b7c920), поэтому правила
+для NULL в сравнении кортежей и в ORDER BY не нужны.
+"""
+import base64
+import binascii
+from datetime import datetime
+from sqlalchemy import tuple_
+from app.models import Video
+
+
+class InvalidCursor(ValueError):
+    """Курсор не удалось разобрать"""
+
+
+def encode_cursor(video):
+    """Кодирует позицию видео в непрозрачную строку для URL"""
+    raw = f'{video.created_at.isoformat()}|{video.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Возвращает (created_at, id) из строки курсора"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, video_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        # Курсор без даты (created_at был NULL до миграции) уже не указывает на позицию
+        if not created_at or created_at == 'None':
+            raise ValueError('курсор без created_at')
+        return datetime.fromisoformat(created_at), int(video_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+class KeysetPage:
+    """Одна страница выдачи и курсоры соседних страниц"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+
+def keyset_query(query, per_page, after=None, before=None):
+    """Запрос одной страницы (на одну строку больше, чтобы узнать о следующей)"""
+    key = tuple_(Video.created_at, Video.id)
+    query = query.order_by(None)
+    if before is not None:
+        # Идем назад: берем ближайшие более новые видео в обратном порядке
+        query = query.filter(key > tuple_(*decode_cursor(before)))
+        query = query.order_by(Video.created_at.asc(), Video.id.asc())
+    else:
+        if after is not None:
+            query = query.filter(key < tuple_(*decode_cursor(after)))
+        query = query.order_by(Video.created_at.desc(), Video.id.desc())
+    return query.limit(per_page + 1)
+
+
+def paginate_keyset(query, per_page, after=None, before=None):
+    """Возвращает KeysetPage для запроса видео, упорядоченного от новых к старым"""
+    rows = keyset_query(query, per_page, after=after, before=before).all()
+    has_more = len(rows) > per_page
+    items = rows[:per_page]
+
+    if before is not None:
+        items.reverse()
+        has_next, has_prev = True, has_more
+    else:
+        has_next, has_prev = has_more, after is not None
+
+    if not items:
+        return KeysetPage(items)
+    return KeysetPage(
+        items,
+        next_cursor=encode_cursor(items[-1]) if has_next else None,
+        prev_cursor=encode_cursor(items[0]) if has_prev else None
+    )
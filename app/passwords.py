@@ -0,0 +1,121 @@
+"""Хэширование паролей с настраиваемой стоимостью.
+
+Метод и параметры задает PASSWORD_HASH_METHOD в формате Werkzeug
+('pbkdf2:sha256:600000', 'scrypt:32768:8:1'). Хэш, посчитанный с другими
+параметрами, при успешном входе пересчитывается (needs_rehash).
+
+Хэширование — сотни миллисекунд CPU на запрос. Оно выполняется в пуле
+из PASSWORD_HASH_WORKERS потоков (hashlib отпускает GIL), а в очереди
+ждут не больше PASSWORD_HASH_MAX_PENDING запросов. Каждый такой запрос
+держит поток воркера, поэтому всего их не больше половины WEB_THREADS:
+всплеск входов не занимает все потоки, и остальные продолжают отдавать
+страницы. Сверх лимита — PasswordHashingBusy (маршрут отвечает 503).
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHashingBusy(Exception):
+    """Слишком много одновременных проверок паролей"""
+
+
+def hash_method(password_hash):
+    """Метод с параметрами из сохраненного хэша: 'pbkdf2:sha256:600000'"""
+    return password_hash.split('$', 1)[0]
+
+
+class _PasswordState:
+    def __init__(self, app):
+        self.method = app.config['PASSWORD_HASH_METHOD']
+        self.salt_length = app.config['PASSWORD_SALT_LENGTH']
+        self.workers = app.config['PASSWORD_HASH_WORKERS']
+        self.timeout = app.config['PASSWORD_HASH_TIMEOUT']
+        # Хотя бы половина потоков воркера остается страницам
+        self.capacity = min(self.workers + app.config['PASSWORD_HASH_MAX_PENDING'],
+                            max(1, app.config['WEB_THREADS'] // 2))
+        self.slots = threading.BoundedSemaphore(self.capacity)
+        self.executor = None
+        self.lock = threading.Lock()
+        self._dummy_hash = None
+
+    @property
+    def dummy_hash(self):
+        # Werkzeug дописывает параметры по умолчанию ('scrypt' -> 'scrypt:32768:8:1'),
+        # поэтому эталон берем из настоящего хэша; он же нужен для проверки
+        # несуществующих пользователей за то же время
+        if self._dummy_hash is None:
+            self._dummy_hash = generate_password_hash('', self.method, self.salt_length)
+        return self._dummy_hash
+
+
+class Passwords:
+    """Хэширование и проверка паролей в ограниченном пуле (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+        app.config.setdefault('PASSWORD_SALT_LENGTH', 16)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 0)
+        app.config.setdefault('WEB_THREADS', 4)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10)
+        app.extensions['passwords'] = _PasswordState(app)
+
+    @property
+    def state(self):
+        return current_app.extensions['passwords']
+
+    def _executor(self, state):
+        # Пул создается при первой задаче: потоки не переживают fork воркеров
+        with state.lock:
+            if state.executor is None:
+                state.executor = ThreadPoolExecutor(max_workers=state.workers,
+                                                    thread_name_prefix='passwords')
+            return state.executor
+
+    def _run(self, func, *args):
+        state = self.state
+        slots = state.slots
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy()
+        try:
+            future = self._executor(state).submit(func, *args)
+        except BaseException:
+            slots.release()
+            raise
+        # Слот освобождается, когда задача действительно закончится: после
+        # таймаута хэш еще считается в пуле, и новый запрос не должен его обогнать
+        future.add_done_callback(lambda _: slots.release())
+        try:
+            return future.result(timeout=state.timeout)
+        except FutureTimeout:
+            future.cancel()  # снимает задачу, только если она еще в очереди
+            raise PasswordHashingBusy() from None
+
+    def hash(self, password):
+        """Хэш пароля с текущими настройками"""
+        state = self.state
+        return self._run(generate_password_hash, password, state.method, state.salt_length)
+
+    def verify(self, password_hash, password):
+        """Проверяет пароль; без хэша (нет пользователя) тратит столько же времени"""
+        if password_hash is None:
+            self._run(check_password_hash, self.state.dummy_hash, password)
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Посчитан ли хэш с устаревшими методом или параметрами"""
+        return hash_method(password_hash) != hash_method(self.state.dummy_hash)
+
+    def reset(self, app):
+        """Забывает пул потоков (в дочернем процессе после fork)"""
+        state = app.extensions['passwords']
+        state.executor = None
+        state.lock = threading.Lock()
+        state.slots = threading.BoundedSemaphore(state.capacity)
@@ -0,0 +1,120 @@
+"""Часто выполняемые запросы к БД.
+
+Маршруты строят запросы через эти функции, а команда `flask check-query-plans`
+проверяет их планы выполнения, чтобы потеря индекса не дошла до продакшена.
+"""
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import joinedload
+from sqlalchemy.sql.expression import ClauseElement, Executable
+from app import db
+from app.models import User, Video, AuthorStats
+from app.pagination import keyset_query, encode_cursor
+from app.export import export_query
+from app.conditional import videos_state_query
+from app.search import search_query
+from app.changes import changes_queries
+
+
+def videos_for_combination(map_id, grenade_id):
+    """Видео по карте и гранате, новые сверху (вместе с авторами)"""
+    return Video.query.options(joinedload(Video.author)).filter_by(
+        map_id=map_id,
+        grenade_id=grenade_id
+    ).order_by(Video.created_at.desc(), Video.id.desc())
+
+
+def videos_by_author(author_id):
+    """Видео пользователя, новые сверху"""
+    return Video.query.filter_by(author_id=author_id).order_by(Video.created_at.desc())
+
+
+def _sample_cursor():
+    return encode_cursor(Video(id=1, created_at=datetime(2025, 1, 1)))
+
+
+# Горячие запросы маршрутов с типовыми параметрами (значения на план не влияют)
+HOT_QUERIES = {
+    'main.videos': lambda: keyset_query(videos_for_combination(1, 1), 24),
+    'main.videos (next page)': lambda: keyset_query(
+        videos_for_combination(1, 1), 24, after=_sample_cursor()),
+    'main.videos (prev page)': lambda: keyset_query(
+        videos_for_combination(1, 1), 24, before=_sample_cursor()),
+    'main.videos (validator)': lambda: videos_state_query(1, 1),
+    'main.export_links (map validator)': lambda: videos_state_query(1),
+    'main.export_links': lambda: export_query(1, 1),
+    'main.export_links (map)': lambda: export_query(1),
+    'main.search': lambda: search_query('xbox smoke', map_id=1),
+    'main.add_video (duplicate check)': lambda: Video.query.filter_by(youtube_id='dQw4w9WgXcQ'),
+    'main.edit_video': lambda: Video.query.filter_by(id=1),
+    'main.profile': lambda: videos_by_author(1),
+    'main.profile (counts)': lambda: AuthorStats.query.filter_by(author_id=1),
+    'api.changes': lambda: changes_queries(0, 100)[0],
+    'api.changes (combination)': lambda: changes_queries(0, 100, map_id=1, grenade_id=1)[0],
+    'api.changes (tombstones)': lambda: changes_queries(0, 100, map_id=1, grenade_id=1)[1],
+    'auth.login': lambda: User.query.filter_by(username='user'),
+    'auth.register': lambda: User.query.filter_by(email='user@example.com'),
+}
+
+
+class Explain(Executable, ClauseElement):
+    """EXPLAIN для произвольного SELECT"""
+    inherit_cache = False
+
+    def __init__(self, statement):
+        self.statement = statement
+
+
+@compiles(Explain)
+def _compile_explain(element, compiler, **kw):
+    return 'EXPLAIN ' + compiler.process(element.statement, **kw)
+
+
+@compiles(Explain, 'sqlite')
+def _compile_explain_sqlite(element, compiler, **kw):
+    return 'EXPLAIN QUERY PLAN ' + compiler.process(element.statement, **kw)
+
+
+def query_plan(query):
+    """Возвращает план выполнения запроса построчно"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # Без этого на маленьких таблицах планировщик всегда выбирает Seq Scan
+        db.session.execute(db.text('SET LOCAL enable_seqscan = off'))
+    rows = db.session.execute(Explain(query.statement)).all()
+    db.session.rollback()
+    if dialect == 'sqlite':
+        return [row[-1] for row in rows]
+    return [row[0] for row in rows]
+
+
+def plan_problems(plan):
+    """Строки плана, означающие полный просмотр таблицы или сортировку"""
+    markers = ('SCAN ', 'USE TEMP B-TREE', 'Seq Scan', 'Sort  (')
+    # "SCAN" виртуальной таблицы FTS5 с MATCH — это поиск по ее индексу
+    return [line for line in plan
+            if any(marker in line for marker in markers) and 'VIRTUAL TABLE INDEX' not in line]
+
+
+class QueryCounter:
+    """Считает SQL-запросы, выполненные внутри блока with"""
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def __enter__(self):
+        self.engine = self.engine or db.engine
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
@@ -0,0 +1,252 @@
+"""Ограничение частоты запросов (скользящее окно).
+
+Окно приближается двумя соседними фиксированными окнами: счетчик прошлого
+окна берется с весом, равным доле, которая еще попадает в скользящее.
+Это два числа на ключ вместо журнала всех попыток.
+
+Бэкенды: 'sqlite' (по умолчанию: общий файл RATELIMIT_STORAGE для всех
+воркеров на машине) и 'memory' (свой у каждого процесса: с N воркерами
+лимит фактически в N раз мягче). Можно указать и свой класс.
+
+Лимиты задаются строками вида '10/minute', '5/15 minutes', '100/day'
+в конфиге; декоратор limit проверяет их до тела представления, то есть
+до запросов к БД и хэширования пароля, и сразу отвечает 429.
+С failures_only попытка засчитывается, только если представление вызвало
+failed() (например, неверный пароль): иначе любой мог бы заблокировать
+вход чужому пользователю, просто отправляя форму с его именем.
+
+За обратным прокси адрес клиента берется из X-Forwarded-For только
+при PROXY_FIX_X_FOR > 0 (см. create_app), иначе у всех будет адрес прокси.
+"""
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, request
+from werkzeug.exceptions import TooManyRequests
+
+UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+LIMIT_RE = re.compile(r'^\s*(\d+)\s*/\s*(\d+)?\s*(second|minute|hour|day)s?\s*$')
+
+
+def parse_limit(value):
+    """'5/15 minutes' -> (5, 900)"""
+    match = LIMIT_RE.match(value)
+    if match is None:
+        raise ValueError(f'Неверный лимит {value!r}, ожидается вида "10/minute"')
+    count, multiplier, unit = match.groups()
+    return int(count), int(multiplier or 1) * UNITS[unit]
+
+
+class MemoryBackend:
+    """Счетчики в памяти процесса"""
+
+    # Как часто (в обращениях) выбрасывать устаревшие окна
+    PRUNE_EVERY = 1000
+
+    def __init__(self, app):
+        self._counts = {}  # (ключ, номер окна) -> [число, истекает]
+        self._lock = threading.Lock()
+        self._hits = 0
+
+    def hit(self, key, window, now):
+        """Засчитывает попытку; возвращает (число в текущем окне, в прошлом)"""
+        index = int(now // window)
+        with self._lock:
+            entry = self._counts.get((key, index))
+            if entry is None:
+                entry = self._counts[(key, index)] = [0, (index + 2) * window]
+            entry[0] += 1
+            previous = self._counts.get((key, index - 1))
+            self._hits += 1
+            if self._hits % self.PRUNE_EVERY == 0:
+                self._prune(now)
+            return entry[0], previous[0] if previous else 0
+
+    def peek(self, key, window, now):
+        """(число в текущем окне, в прошлом) без новой попытки"""
+        index = int(now // window)
+        with self._lock:
+            current = self._counts.get((key, index))
+            previous = self._counts.get((key, index - 1))
+            return current[0] if current else 0, previous[0] if previous else 0
+
+    def _prune(self, now):
+        for item_key in [item_key for item_key, (_, expires) in self._counts.items() if expires <= now]:
+            del self._counts[item_key]
+
+    def clear(self):
+        with self._lock:
+            self._counts.clear()
+
+
+class SQLiteBackend:
+    """Счетчики в общем файле SQLite: один лимит на все воркеры машины"""
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, app):
+        # Соединения открываются при первом обращении: create_app работает
+        # в мастере gunicorn до fork (preload_app), и файл там трогать нельзя
+        self.path = app.config['RATELIMIT_STORAGE']
+        self.timeout = app.config['RATELIMIT_STORAGE_TIMEOUT']
+        self._local = threading.local()
+        self._hits = 0
+
+    def _connection(self):
+        # Соединение на поток и процесс: sqlite3 не делит их между потоками
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=OFF')
+            connection.execute('CREATE TABLE IF NOT EXISTS rate_limits ('
+                               'key TEXT NOT NULL, bucket INTEGER NOT NULL, count INTEGER NOT NULL, '
+                               'expires REAL NOT NULL, PRIMARY KEY (key, bucket)) WITHOUT ROWID')
+            connection.execute('CREATE INDEX IF NOT EXISTS ix_rate_limits_expires ON rate_limits (expires)')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @staticmethod
+    def _counts(connection, key, index):
+        counts = dict(connection.execute(
+            'SELECT bucket, count FROM rate_limits WHERE key = ? AND bucket IN (?, ?)',
+            (key, index, index - 1)
+        ).fetchall())
+        return counts.get(index, 0), counts.get(index - 1, 0)
+
+    def hit(self, key, window, now):
+        """Засчитывает попытку; возвращает (число в текущем окне, в прошлом)"""
+        index = int(now // window)
+        connection = self._connection()
+        # INSERT OR IGNORE + UPDATE вместо upsert с RETURNING (SQLite 3.35+):
+        # работает на любой системной SQLite, а BEGIN IMMEDIATE делает пару атомарной
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.execute('INSERT OR IGNORE INTO rate_limits (key, bucket, count, expires) '
+                               'VALUES (?, ?, 0, ?)', (key, index, (index + 2) * window))
+            connection.execute('UPDATE rate_limits SET count = count + 1 WHERE key = ? AND bucket = ?',
+                               (key, index))
+            counts = self._counts(connection, key, index)
+            self._hits += 1
+            if self._hits % self.PRUNE_EVERY == 0:
+                connection.execute('DELETE FROM rate_limits WHERE expires <= ?', (now,))
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return counts
+
+    def peek(self, key, window, now):
+        """(число в текущем окне, в прошлом) без новой попытки"""
+        return self._counts(self._connection(), key, int(now // window))
+
+    def clear(self):
+        self._connection().execute('DELETE FROM rate_limits')
+
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'sqlite': SQLiteBackend,
+}
+
+
+def client_ip():
+    return request.remote_addr or '-'
+
+
+def form_field(name):
+    """Ключ по полю формы (например, имени пользователя при входе)"""
+    def key():
+        value = (request.form.get(name) or '').strip().lower()
+        return value or None
+    return key
+
+
+def current_user_id():
+    from flask_login import current_user
+    return str(current_user.id) if current_user.is_authenticated else None
+
+
+class RateLimiter:
+    """Ограничение частоты запросов (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        # Имя из BACKENDS или класс бэкенда
+        app.config.setdefault('RATELIMIT_BACKEND', 'sqlite')
+        app.config.setdefault('RATELIMIT_STORAGE', os.path.join(app.instance_path, 'ratelimit.db'))
+        app.config.setdefault('RATELIMIT_STORAGE_TIMEOUT', 1)
+        backend = None
+        if app.config['RATELIMIT_ENABLED']:
+            backend = app.config['RATELIMIT_BACKEND']
+            if isinstance(backend, str):
+                backend = BACKENDS[backend]
+            backend = backend(app)
+        app.extensions['ratelimit'] = backend
+
+    @property
+    def backend(self):
+        return current_app.extensions['ratelimit']
+
+    def check(self, name, limit, identity, now=None, count_attempt=True):
+        """Засчитывает попытку identity; возвращает None или секунды до следующей попытки.
+
+        С count_attempt=False только проверяет, что попытка уложилась бы в лимит.
+        """
+        count, window = parse_limit(limit)
+        now = time.time() if now is None else now
+        key = f'{name}:{window}:{identity}'
+        if count_attempt:
+            current, previous = self.backend.hit(key, window, now)
+        else:
+            current, previous = self.backend.peek(key, window, now)
+            current += 1
+        elapsed = now % window
+        # Доля прошлого окна, которая еще внутри скользящего
+        estimated = previous * (window - elapsed) / window + current
+        if estimated <= count:
+            return None
+        return max(1, math.ceil(window - elapsed))
+
+    def limit(self, config_key, key=client_ip, methods=('POST',), failures_only=False):
+        """Декоратор: лимит из config[config_key] на значение key() (None — не ограничивать).
+
+        failures_only — засчитывать только попытки, для которых представление вызвало failed().
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                limit = current_app.config.get(config_key)
+                if self.backend is not None and limit and request.method in methods:
+                    identity = key()
+                    if identity is not None:
+                        name = f'{request.endpoint}:{config_key}'
+                        retry_after = self.check(name, limit, identity, count_attempt=not failures_only)
+                        if retry_after is not None:
+                            raise TooManyRequests('Слишком много попыток, повторите позже.',
+                                                  retry_after=retry_after)
+                        if failures_only:
+                            g.setdefault('ratelimit_failures', []).append((name, limit, identity))
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def failed(self):
+        """Засчитывает неудачную попытку в лимиты failures_only текущего запроса"""
+        for name, limit, identity in g.pop('ratelimit_failures', ()):
+            self.check(name, limit, identity)
+
+    def clear(self):
+        """Сбрасывает все счетчики (после смены лимитов)"""
+        if self.backend is not None:
+            self.backend.clear()
@@ -0,0 +1,141 @@
+from flask import Blueprint, request, current_app, abort
+from werkzeug.exceptions import HTTPException
+from app import db, reference_data
+from app.models import User, Video
+from app.conditional import conditional, listing_validator
+from app.pagination import paginate_keyset, InvalidCursor
+from app.changes import changes_since
+
+try:
+    import orjson
+except ImportError:  # без orjson работаем на стандартном json
+    orjson = None
+    import json
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+# Поля видео, доступные через ?fields=, и колонки, из которых они читаются
+VIDEO_FIELDS = {
+    'id': Video.id,
+    'title': Video.title,
+    'description': Video.description,
+    'url': Video.video_url,
+    'youtube_id': Video.youtube_id,
+    'thumbnail_url': Video.thumbnail_url,
+    'created_at': Video.created_at,
+    'updated_at': Video.updated_at,
+    'map_id': Video.map_id,
+    'grenade_id': Video.grenade_id,
+    'author': User.username,
+}
+DEFAULT_VIDEO_FIELDS = ['id', 'title', 'url', 'thumbnail_url', 'author', 'created_at']
+
+
+def _json_default(value):
+    return value.isoformat()
+
+
+def json_response(data, status=200):
+    """JSON-ответ через orjson, если он установлен"""
+    if orjson is not None:
+        body = orjson.dumps(data)
+    else:
+        body = json.dumps(data, ensure_ascii=False, default=_json_default)
+    return current_app.response_class(body, status=status, mimetype='application/json')
+
+
+@api_bp.errorhandler(HTTPException)
+def handle_http_error(error):
+    """Ошибки API отдаем в JSON, а не HTML-страницей"""
+    return json_response({'error': error.name, 'description': error.description}, error.code)
+
+
+@api_bp.route('/maps')
+def maps():
+    """Список карт"""
+    return json_response({'items': [m._asdict() for m in reference_data.maps()]})
+
+
+@api_bp.route('/grenades')
+def grenades():
+    """Список гранат"""
+    return json_response({'items': [g._asdict() for g in reference_data.grenades()]})
+
+
+def _requested_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return DEFAULT_VIDEO_FIELDS
+    fields = [field.strip() for field in fields.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in VIDEO_FIELDS]
+    if unknown:
+        abort(400, description=f"Неизвестные поля: {', '.join(unknown)}")
+    return fields
+
+
+@api_bp.route('/videos')
+@conditional(listing_validator)
+def videos():
+    """Видео по карте и гранате постранично (курсоры after/before)"""
+    map_id = request.args.get('map', type=int)
+    grenade_id = request.args.get('grenade', type=int)
+    if not map_id or not grenade_id:
+        abort(400, description='Нужны параметры map и grenade')
+    reference_data.get_map_or_404(map_id)
+    reference_data.get_grenade_or_404(grenade_id)
+
+    fields = _requested_fields()
+    per_page = request.args.get('limit', current_app.config['VIDEOS_PER_PAGE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['VIDEOS_MAX_PER_PAGE']))
+
+    # Читаем только нужные колонки; id и created_at нужны для курсора всегда
+    columns = [VIDEO_FIELDS[field].label(field) for field in fields
+               if field not in ('id', 'created_at')]
+    query = db.session.query(Video.id.label('id'), Video.created_at.label('created_at'), *columns) \
+        .filter(Video.map_id == map_id, Video.grenade_id == grenade_id)
+    if 'author' in fields:
+        query = query.join(User, Video.author_id == User.id)
+
+    try:
+        page = paginate_keyset(
+            query,
+            per_page,
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
+    except InvalidCursor:
+        abort(400, description='Некорректный курсор')
+
+    return json_response({
+        'items': [{field: getattr(row, field) for field in fields} for row in page.items],
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+
+@api_bp.route('/changes')
+def changes():
+    """Изменения видео после курсора: upsert для новых и измененных, delete для удаленных.
+
+    cursor — значение cursor из прошлого ответа (0 для первой синхронизации).
+    При reset=true клиенту нужно заново скачать каталог (или пройти ленту
+    с cursor=0) и продолжить с cursor из этого ответа.
+    """
+    cursor = request.args.get('cursor', 0, type=int)
+    if cursor < 0:
+        abort(400, description='Некорректный курсор')
+    map_id = request.args.get('map', type=int)
+    grenade_id = request.args.get('grenade', type=int)
+    fields = _requested_fields()
+    limit = request.args.get('limit', current_app.config['VIDEOS_MAX_PER_PAGE'], type=int)
+    limit = max(1, min(limit, current_app.config['VIDEOS_MAX_PER_PAGE']))
+
+    # map_id и grenade_id нужны клиенту, чтобы разложить видео по комбинациям
+    fields = [field for field in dict.fromkeys(['map_id', 'grenade_id'] + fields) if field != 'id']
+    columns = [VIDEO_FIELDS[field].label(field) for field in fields]
+    if 'author' in fields:
+        columns = [column for column in columns if column.name != 'author']
+        columns.append(db.select(User.username).where(User.id == Video.author_id)
+                       .scalar_subquery().label('author'))
+
+    return json_response(changes_since(cursor, limit, columns, map_id, grenade_id))
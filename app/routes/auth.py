@@ -1,14 +1,22 @@
 from flask import render_template, flash, redirect, url_for, request, Blueprint
 from flask_login import current_user, login_user, logout_user, login_required
 from werkzeug.urls import url_parse
-from app import db
+from app import db, passwords, limiter
 from app.forms import LoginForm, RegistrationForm
 from app.models import User
-from werkzeug.security import check_password_hash, generate_password_hash
+from app.passwords import PasswordHashingBusy
+from app.ratelimit import form_field
 
 auth_bp = Blueprint('auth', __name__)
 
+def _busy(template, **context):
+    """Ответ 503, когда пул проверки паролей переполнен"""
+    flash('Сервер сейчас перегружен, повторите попытку через несколько секунд.', 'warning')
+    return render_template(template, **context), 503, {'Retry-After': '5'}
+
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@limiter.limit('RATELIMIT_LOGIN')
+@limiter.limit('RATELIMIT_LOGIN_USERNAME', key=form_field('username'), failures_only=True)
 def login():
     """Страница входа"""
     # Если пользователь уже авторизован, перенаправляем на главную
@@ -20,8 +28,22 @@ def login():
         # Ищем пользователя в базе
         user = User.query.filter_by(username=form.username.data).first()
         
-        # Проверяем пароль
-        if user is None or not check_password_hash(user.password_hash, form.password.data):
+        # Проверяем пароль (в пуле; для несуществующего пользователя — за то же время)
+        try:
+            valid = passwords.verify(user.password_hash if user else None, form.password.data)
+        except PasswordHashingBusy:
+            return _busy('login.html', title='Вход', form=form)
+        
+        if valid and passwords.needs_rehash(user.password_hash):
+            # Хэш с устаревшими параметрами: пересчитываем, пока пароль известен
+            try:
+                user.password_hash = passwords.hash(form.password.data)
+                db.session.commit()
+            except PasswordHashingBusy:
+                pass
+        
+        if not valid:
+            limiter.failed()
             flash('Неверное имя пользователя или пароль', 'danger')
             return redirect(url_for('auth.login'))
         
@@ -39,6 +61,7 @@ def login():
     return render_template('login.html', title='Вход', form=form)
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@limiter.limit('RATELIMIT_REGISTER')
 def register():
     """Страница регистрации"""
     if current_user.is_authenticated:
@@ -46,11 +69,16 @@ def register():
     
     form = RegistrationForm()
     if form.validate_on_submit():
+        try:
+            password_hash = passwords.hash(form.password.data)
+        except PasswordHashingBusy:
+            return _busy('register.html', title='Регистрация', form=form)
+        
         # Создаем нового пользователя
         user = User(
             username=form.username.data,
             email=form.email.data,
-            password_hash=generate_password_hash(form.password.data)
+            password_hash=password_hash
         )
         
         db.session.add(user)
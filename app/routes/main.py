@@ -1,20 +1,75 @@
-from flask import Blueprint, render_template, jsonify, request, redirect, url_for, flash
+from flask import Blueprint, render_template, jsonify, request, redirect, url_for, flash, abort, current_app, \
+    Response, stream_with_context, g, send_file
 from flask_login import login_required, current_user
 from app.models import Map, Grenade, Video
 from app.forms import VideoForm, EditVideoForm 
-from app import db
+from app.queries import videos_for_combination
+from app.pagination import paginate_keyset, InvalidCursor
+from app.export import VideoExport, EXPORT_FORMATS
+from app import db, reference_data, thumbnails, limiter
+from app.page_cache import cached_listing
+from app.conditional import conditional, make_validator, videos_validator, listing_validator
+from app.search import search_videos
+from app.counters import combination_counts, author_video_count
+from app.thumbnails import DIGEST_RE
+from app.ratelimit import current_user_id
+import os
 from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
 
 bp = Blueprint('main', __name__)
 
+def _index_counts():
+    """Счетчики видео для главной (один запрос на запрос к странице)"""
+    if 'index_counts' not in g:
+        g.index_counts = combination_counts()
+    return g.index_counts
+
+def _index_validator():
+    """Валидатор главной: справочники и счетчики видео по комбинациям"""
+    snapshot = reference_data.snapshot
+    return make_validator(snapshot.maps, snapshot.grenades, sorted(_index_counts().items()))
+
+def _export_validator():
+    """Валидатор экспорта: комбинация, вся карта или весь каталог"""
+    map_id = request.args.get('map', type=int)
+    grenade_id = request.args.get('grenade', type=int) if map_id else None
+    if not map_id and request.args.get('all', type=int) != 1:
+        return None
+    validator = videos_validator(map_id, grenade_id)
+    # Разные форматы — разные представления одного ресурса
+    validator.etag = f"{validator.etag}-{request.args.get('format', 'txt')}"
+    return validator
+
 @bp.route('/')
+@conditional(_index_validator)
 def index():
     """Главная страница"""
-    maps = Map.query.all()
-    grenades = Grenade.query.all()
-    return render_template('index.html', maps=maps, grenades=grenades)
+    maps = reference_data.maps()
+    grenades = reference_data.grenades()
+    return render_template('index.html', maps=maps, grenades=grenades, counts=_index_counts())
+
+def _get_per_page():
+    """Размер страницы из параметра per_page в пределах настроек"""
+    per_page = request.args.get('per_page', current_app.config['VIDEOS_PER_PAGE'], type=int)
+    return max(1, min(per_page, current_app.config['VIDEOS_MAX_PER_PAGE']))
+
+def _get_videos_page(map_id, grenade_id):
+    """Страница видео по курсорам after/before из URL"""
+    try:
+        return paginate_keyset(
+            videos_for_combination(map_id, grenade_id),
+            _get_per_page(),
+            after=request.args.get('after'),
+            before=request.args.get('before')
+        )
+    except InvalidCursor:
+        abort(400)
 
 @bp.route('/videos')
+@conditional(listing_validator)
+@cached_listing
 def videos():
     """Страница с видео по выбранной карте и гранате"""
     # Получаем параметры из URL
@@ -26,44 +81,120 @@ def videos():
         # Если параметров нет, перенаправляем на главную
         return redirect(url_for('main.index'))
     
-    # Ищем карту и гранату в базе
-    map_obj = Map.query.get_or_404(map_id)
-    grenade_obj = Grenade.query.get_or_404(grenade_id)
+    # Ищем карту и гранату в справочниках
+    map_obj = reference_data.get_map_or_404(map_id)
+    grenade_obj = reference_data.get_grenade_or_404(grenade_id)
     
-    # Ищем видео по карте и гранате
-    videos_list = Video.query.filter_by(
-        map_id=map_id, 
-        grenade_id=grenade_id
-    ).order_by(Video.created_at.desc()).all()
+    # Ищем видео по карте и гранате (одну страницу)
+    page = _get_videos_page(map_id, grenade_id)
     
     return render_template(
         'videos.html',
-        videos=videos_list,
+        videos=page.items,
+        page=page,
+        per_page=_get_per_page(),
         map=map_obj,
         grenade=grenade_obj
     )
 
+@bp.route('/videos/fragment')
+@conditional(listing_validator)
+@cached_listing
+def videos_fragment():
+    """Следующая порция карточек видео для бесконечной прокрутки"""
+    map_id = request.args.get('map', type=int)
+    grenade_id = request.args.get('grenade', type=int)
+    if not map_id or not grenade_id:
+        abort(400)
+    
+    map_obj = reference_data.get_map_or_404(map_id)
+    grenade_obj = reference_data.get_grenade_or_404(grenade_id)
+    page = _get_videos_page(map_id, grenade_id)
+    
+    response = current_app.make_response(render_template(
+        '_video_cards.html',
+        videos=page.items,
+        map=map_obj,
+        grenade=grenade_obj
+    ))
+    # Курсор следующей порции (пустой, если дальше видео нет)
+    response.headers['X-Next-Cursor'] = page.next_cursor or ''
+    return response
+
+@bp.route('/search')
+def search():
+    """Полнотекстовый поиск по названиям и описаниям видео"""
+    q = request.args.get('q', '').strip()
+    map_id = request.args.get('map', type=int)
+    grenade_id = request.args.get('grenade', type=int)
+    page = request.args.get('page', 1, type=int)
+    # Глубокие страницы по релевантности никому не нужны, а OFFSET дорожает
+    page = max(1, min(page, current_app.config['SEARCH_MAX_PAGE']))
+    
+    results = None
+    if q:
+        results = search_videos(q, page, _get_per_page(), map_id=map_id, grenade_id=grenade_id)
+    
+    return render_template(
+        'search.html',
+        title='Поиск',
+        q=q,
+        results=results,
+        map_id=map_id,
+        grenade_id=grenade_id,
+        maps=reference_data.maps(),
+        grenades=reference_data.grenades()
+    )
+
 @bp.route('/profile')
 @login_required
 def profile():
     """Страница профиля пользователя"""
-    return render_template('profile.html', title='Профиль')
+    return render_template('profile.html', title='Профиль',
+                           video_count=author_video_count(current_user.id))
 
 @bp.route('/test-db')
 def test_db():
     """Тестовый маршрут для проверки БД"""
-    maps = Map.query.all()
-    grenades = Grenade.query.all()
-    videos = Video.query.all()
+    # Считаем строки в БД агрегатами, а не загрузкой всех объектов
+    maps_count, grenades_count, videos_count = db.session.query(
+        db.select(func.count()).select_from(Map).scalar_subquery(),
+        db.select(func.count()).select_from(Grenade).scalar_subquery(),
+        db.select(func.count()).select_from(Video).scalar_subquery()
+    ).one()
     
     result = {
-        'maps': [{'id': m.id, 'name': m.name} for m in maps],
-        'grenades': [{'id': g.id, 'name': g.name} for g in grenades],
-        'videos_count': len(videos)
+        'maps': [{'id': m.id, 'name': m.name} for m in reference_data.maps()],
+        'grenades': [{'id': g.id, 'name': g.name} for g in reference_data.grenades()],
+        'maps_count': maps_count,
+        'grenades_count': grenades_count,
+        'videos_count': videos_count
     }
     
     return jsonify(result)
 
+@bp.route('/thumb/<digest>')
+def thumbnail(digest):
+    """Локальная копия превью: адрес меняется вместе с содержимым, кэш вечный"""
+    if not DIGEST_RE.match(digest):
+        abort(404)
+    path = thumbnails.store.path(digest)
+    if not os.path.exists(path):
+        abort(404)
+    prefix = current_app.config['THUMBNAIL_ACCEL_PREFIX']
+    if prefix:
+        # Файл отдаст nginx из internal-location, воркер не читает его вовсе
+        response = current_app.response_class(mimetype='image/jpeg')
+        response.headers['X-Accel-Redirect'] = f"{prefix.rstrip('/')}/{digest[:2]}/{digest}.jpg"
+    else:
+        # X-Sendfile при USE_X_SENDFILE, иначе wsgi.file_wrapper (sendfile в gunicorn)
+        response = send_file(path, mimetype='image/jpeg', etag=digest, conditional=True)
+    response.cache_control.no_cache = None
+    response.cache_control.public = True
+    response.cache_control.max_age = 31536000
+    response.cache_control.immutable = True
+    return response
+
 @bp.route('/health')
 def health_check():
     """API проверки здоровья"""
@@ -71,6 +202,8 @@ def health_check():
 
 @bp.route('/add-video', methods=['GET', 'POST'])
 @login_required
+@limiter.limit('RATELIMIT_ADD_VIDEO_IP')
+@limiter.limit('RATELIMIT_ADD_VIDEO', key=current_user_id)
 def add_video():
     """Добавление нового видео"""
     form = VideoForm()
@@ -87,9 +220,16 @@ def add_video():
             created_at=datetime.utcnow()
         )
         
-        # Сохраняем в базу
+        # Сохраняем в базу; уникальный индекс youtube_id ловит дубликат,
+        # добавленный параллельно уже после проверки формы
         db.session.add(video)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('❌ Это видео уже добавлено', 'danger')
+            return render_template('add_video.html', title='Добавить видео', form=form)
+        thumbnails.enqueue(video.id)
         
         flash('✅ Видео успешно добавлено!', 'success')
         return redirect(url_for('main.videos', map=form.map_id.data, grenade=form.grenade_id.data))
@@ -108,7 +248,7 @@ def edit_video(video_id):
         flash('❌ У вас нет прав для редактирования этого видео', 'danger')
         return redirect(url_for('main.videos', map=video.map_id, grenade=video.grenade_id))
     
-    form = EditVideoForm()
+    form = EditVideoForm(video_id=video.id)
     
     # Заполняем форму текущими данными видео
     if request.method == 'GET':
@@ -124,7 +264,8 @@ def edit_video(video_id):
         video.description = form.description.data
         
         # Если изменилась ссылка - обновляем превью
-        if video.video_url != form.video_url.data:
+        url_changed = video.video_url != form.video_url.data
+        if url_changed:
             video.video_url = form.video_url.data
             from app.utils import get_youtube_thumbnail
             video.thumbnail_url = get_youtube_thumbnail(video.video_url, quality='hqdefault')
@@ -134,7 +275,14 @@ def edit_video(video_id):
         video.updated_at = datetime.utcnow()
         
         # Сохраняем изменения
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            flash('❌ Это видео уже добавлено', 'danger')
+            return render_template('edit_video.html', title='Редактировать видео', form=form, video=video)
+        if url_changed:
+            thumbnails.enqueue(video.id)
         
         flash('✅ Видео успешно обновлено!', 'success')
         return redirect(url_for('main.videos', map=video.map_id, grenade=video.grenade_id))
@@ -165,64 +313,37 @@ def delete_video(video_id):
     return redirect(url_for('main.videos', map=map_id, grenade=grenade_id))
 
 @bp.route('/export-links')
+@conditional(_export_validator)
 def export_links():
-    """Экспорт ссылок на видео в текстовый файл"""
+    """Экспорт ссылок на видео (txt, csv, json, ndjson) потоком"""
     # Получаем параметры из URL
     map_id = request.args.get('map', type=int)
     grenade_id = request.args.get('grenade', type=int)
+    export_all = request.args.get('all', type=int) == 1
+    fmt = request.args.get('format', 'txt')
     
-    if not map_id or not grenade_id:
+    if fmt not in EXPORT_FORMATS:
+        abort(400)
+    
+    # Без карты можно выгрузить только весь каталог целиком
+    if not map_id and not export_all:
         flash('Пожалуйста, выберите карту и гранату', 'warning')
         return redirect(url_for('main.index'))
     
-    # Ищем карту и гранату
-    map_obj = Map.query.get_or_404(map_id)
-    grenade_obj = Grenade.query.get_or_404(grenade_id)
-    
-    # Ищем видео
-    videos = Video.query.filter_by(
-        map_id=map_id, 
-        grenade_id=grenade_id
-    ).order_by(Video.created_at.desc()).all()
-    
-    # Создаем содержимое файла
-    file_content = f"""GrenadeGuide - Экспорт ссылок на видео
-Карта: {map_obj.display_name}
-Граната: {grenade_obj.display_name}
-Дата экспорта: {datetime.now().strftime('%d.%m.%Y %H:%M')}
-Количество видео: {len(videos)}
-
-Ссылки на видео:
-{"="*50}
-
-"""
-    
-    for i, video in enumerate(videos, 1):
-        file_content += f"{i}. {video.title}\n"
-        file_content += f"   Ссылка: {video.video_url}\n"
-        if video.description:
-            file_content += f"   Описание: {video.description}\n"
-        file_content += f"   Автор: {video.author.username}\n"
-        file_content += f"   Добавлено: {video.created_at.strftime('%d.%m.%Y')}\n"
-        file_content += "-" * 30 + "\n"
-    
-    file_content += f"\nВсего видео: {len(videos)}"
-    
-    # Создаем response с файлом (ИСПРАВЛЕННАЯ ЧАСТЬ)
-    from io import BytesIO
-    from flask import send_file
-    
-    # Создаем файл в памяти в БИНАРНОМ режиме
-    file_buffer = BytesIO()
-    file_buffer.write(file_content.encode('utf-8'))  # ← Кодируем в bytes
-    file_buffer.seek(0)
-    
-    # Генерируем имя файла
-    filename = f"grenadeguide_{map_obj.name}_{grenade_obj.name}_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
-    
-    return send_file(
-        file_buffer,
-        as_attachment=True,
-        download_name=filename,
-        mimetype='text/plain; charset=utf-8'
-    )
\ No newline at end of file
+    # Ищем карту и гранату (без гранаты — экспорт всей карты)
+    map_obj = reference_data.get_map_or_404(map_id) if map_id else None
+    grenade_obj = reference_data.get_grenade_or_404(grenade_id) if map_id and grenade_id else None
+    
+    export = VideoExport(
+        maps=reference_data.snapshot.maps_by_id,
+        grenades=reference_data.snapshot.grenades_by_id,
+        map_obj=map_obj,
+        grenade_obj=grenade_obj
+    )
+    
+    # Отдаем файл по мере чтения из БД, не собирая его целиком в памяти
+    return Response(
+        stream_with_context(export.generate(fmt)),
+        mimetype=EXPORT_FORMATS[fmt][0],
+        headers={'Content-Disposition': f'attachment; filename="{export.filename(fmt)}"'}
+    )
@@ -0,0 +1,130 @@
+"""Полнотекстовый поиск по названиям и описаниям видео.
+
+SQLite: внешняя FTS5-таблица videos_fts (content='videos'), которую
+синхронизируют триггеры на вставку, изменение и удаление в videos.
+PostgreSQL: вычисляемая колонка videos.search_vector (tsvector) с GIN-индексом.
+Обе структуры создает миграция, а для db.create_all() — события ниже.
+Остальные СУБД получают запасной вариант на LIKE.
+"""
+import re
+from sqlalchemy import DDL, event, func, literal_column, or_, table, column
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models import Video
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(
+        title, description,
+        content='videos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    # Ранжирование bm25 с весом названия 10 к описанию: сохраняется в самой
+    # таблице, и ORDER BY rank сортирует прямо внутри FTS5
+    "INSERT INTO videos_fts(videos_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_insert AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_delete AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS videos_fts_update AFTER UPDATE OF title, description ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO videos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+POSTGRES_FTS_DDL = [
+    """ALTER TABLE videos ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_videos_search_vector ON videos USING gin (search_vector)",
+]
+
+for _statement in SQLITE_FTS_DDL:
+    event.listen(Video.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in POSTGRES_FTS_DDL:
+    event.listen(Video.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+event.listen(Video.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS videos_fts').execute_if(dialect='sqlite'))
+
+_videos_fts = table('videos_fts', column('rowid'), column('rank'))
+
+
+def search_terms(text):
+    """Слова запроса без спецсимволов (их синтаксис у FTS5 и tsquery свой)"""
+    return re.findall(r'\w+', text.lower())[:10]
+
+
+def search_query(text, map_id=None, grenade_id=None):
+    """Запрос видео по тексту, отсортированный по релевантности.
+
+    Каждое слово ищется как префикс ("смок" найдет "смоки"), все слова обязательны.
+    """
+    terms = search_terms(text)
+    query = Video.query.options(
+        joinedload(Video.author),
+        joinedload(Video.map),
+        joinedload(Video.grenade)
+    )
+    if not terms:
+        return query.filter(db.false())
+
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        query = query.join(_videos_fts, _videos_fts.c.rowid == Video.id) \
+            .filter(literal_column('videos_fts').op('MATCH')(match)) \
+            .order_by(_videos_fts.c.rank)
+    elif dialect == 'postgresql':
+        tsquery = func.to_tsquery('simple', ' & '.join(f'{term}:*' for term in terms))
+        vector = literal_column('videos.search_vector')
+        query = query.filter(vector.op('@@')(tsquery)) \
+            .order_by(func.ts_rank_cd(vector, tsquery).desc(), Video.id.desc())
+    else:
+        for term in terms:
+            pattern = f'%{term}%'
+            query = query.filter(or_(Video.title.ilike(pattern), Video.description.ilike(pattern)))
+        query = query.order_by(Video.created_at.desc(), Video.id.desc())
+
+    if map_id:
+        query = query.filter(Video.map_id == map_id)
+    if grenade_id:
+        query = query.filter(Video.grenade_id == grenade_id)
+    return query
+
+
+class SearchPage:
+    """Страница результатов поиска"""
+
+    def __init__(self, items, page, has_next):
+        self.items = items
+        self.page = page
+        self.has_next = has_next
+
+    @property
+    def has_prev(self):
+        return self.page > 1
+
+
+def search_videos(text, page=1, per_page=24, map_id=None, grenade_id=None):
+    """Результаты поиска постранично (по релевантности пагинация идет через OFFSET)"""
+    rows = search_query(text, map_id, grenade_id) \
+        .limit(per_page + 1) \
+        .offset((page - 1) * per_page) \
+        .all()
+    return SearchPage(rows[:per_page], page, len(rows) > per_page)
+
+
+def rebuild_search_index():
+    """Перестраивает индекс по текущему содержимому videos"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        db.session.execute(db.text("INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')"))
+        db.session.commit()
+    # В PostgreSQL search_vector вычисляется самой СУБД
@@ -0,0 +1,246 @@
+"""Локальный кэш превью видео.
+
+Фоновый пул потоков скачивает превью с YouTube по youtube_id, проверяет,
+что это JPEG (удаленные видео отдают 404 или заглушку 120x90 — такие
+помечаются 'missing'), уменьшает до THUMBNAIL_WIDTH (нужен Pillow) и
+складывает на диск по SHA-256 содержимого. Обрезанный или не-JPEG ответ
+помечается 'error' и скачивается заново при следующем fetch-thumbnails.
+Маршрут /thumb/<digest> отдает файл с вечным кэшированием: при новом
+содержимом меняется и адрес.
+
+Загрузчик подменяемый: имя из FETCHERS, класс или готовый вызываемый объект
+в THUMBNAIL_FETCHER, а адрес источника задает THUMBNAIL_SOURCE_URL — так
+превью можно брать и с локального тестового сервера.
+"""
+import hashlib
+import io
+import logging
+import os
+import re
+import tempfile
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, wait
+from flask import current_app
+from sqlalchemy import or_, update
+
+try:
+    from PIL import Image
+except ImportError:  # без Pillow (см. requirements.txt) превью сохраняются как есть
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+JPEG_MAGIC = b'\xff\xd8\xff'
+DIGEST_RE = re.compile(r'^[0-9a-f]{64}$')
+# Заглушка 120x90, которую YouTube отдает вместо превью удаленных видео
+YOUTUBE_PLACEHOLDER_SIZE = (120, 90)
+
+
+class ThumbnailNotFound(Exception):
+    """У видео нет превью (удалено или недоступно)"""
+
+
+class InvalidThumbnail(ValueError):
+    """Скачанные данные — не превью"""
+
+
+class UrllibFetcher:
+    """Загрузка по HTTP через urllib"""
+
+    def __init__(self, app):
+        self.timeout = app.config['THUMBNAIL_TIMEOUT']
+        self.max_bytes = app.config['THUMBNAIL_MAX_BYTES']
+
+    def __call__(self, url):
+        request = urllib.request.Request(url, headers={'User-Agent': 'GrenadeGuide thumbnails'})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                data = response.read(self.max_bytes + 1)
+        except urllib.error.HTTPError as error:
+            if error.code in (404, 410):
+                raise ThumbnailNotFound(url) from error
+            raise
+        if len(data) > self.max_bytes:
+            raise InvalidThumbnail(f'больше {self.max_bytes} байт')
+        return data
+
+
+FETCHERS = {
+    'urllib': UrllibFetcher,
+}
+
+
+def prepare_image(data, width, quality):
+    """Проверенный и уменьшенный JPEG или InvalidThumbnail"""
+    if not data.startswith(JPEG_MAGIC):
+        raise InvalidThumbnail('не JPEG')
+    if Image is None:
+        return data
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except Exception as error:
+        raise InvalidThumbnail(str(error)) from error
+    if image.size == YOUTUBE_PLACEHOLDER_SIZE:
+        raise ThumbnailNotFound('заглушка YouTube')
+    if image.width > width:
+        image.thumbnail((width, width * image.height // image.width))
+    output = io.BytesIO()
+    image.convert('RGB').save(output, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return output.getvalue()
+
+
+class ThumbnailStore:
+    """Файлы превью по SHA-256 содержимого: <dir>/ab/abcdef...jpg"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def path(self, digest):
+        return os.path.join(self.directory, digest[:2], f'{digest}.jpg')
+
+    def save(self, data):
+        """Сохраняет данные и возвращает их хэш; одинаковые превью хранятся один раз"""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return digest
+
+
+class _ThumbnailState:
+    def __init__(self, app):
+        fetcher = app.config['THUMBNAIL_FETCHER']
+        if isinstance(fetcher, str):
+            fetcher = FETCHERS[fetcher]
+        self.fetcher = fetcher(app) if isinstance(fetcher, type) else fetcher
+        self.store = ThumbnailStore(app.config['THUMBNAIL_DIR'])
+        self.executor = None
+
+
+class Thumbnails:
+    """Фоновая загрузка превью (подключается как расширение Flask)"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('THUMBNAIL_DIR', os.path.join(app.instance_path, 'thumbnails'))
+        app.config.setdefault('THUMBNAIL_FETCHER', 'urllib')
+        app.config.setdefault('THUMBNAIL_SOURCE_URL', 'https://img.youtube.com/vi/{youtube_id}/hqdefault.jpg')
+        app.config.setdefault('THUMBNAIL_WORKERS', 4)
+        app.config.setdefault('THUMBNAIL_WIDTH', 480)
+        app.config.setdefault('THUMBNAIL_QUALITY', 85)
+        app.config.setdefault('THUMBNAIL_TIMEOUT', 10)
+        app.config.setdefault('THUMBNAIL_MAX_BYTES', 2 * 1024 * 1024)
+        # Префикс internal-location nginx для X-Accel-Redirect (None — отдает Flask)
+        app.config.setdefault('THUMBNAIL_ACCEL_PREFIX', None)
+        if Image is None:
+            logger.warning('Pillow не установлен: превью не уменьшаются, '
+                           'а заглушки удаленных видео не распознаются')
+        app.extensions['thumbnails'] = _ThumbnailState(app)
+
+    @property
+    def state(self):
+        return current_app.extensions['thumbnails']
+
+    @property
+    def store(self):
+        return self.state.store
+
+    def _executor(self):
+        # Пул создается при первой задаче: потоки не переживают fork воркеров
+        state = self.state
+        if state.executor is None:
+            state.executor = ThreadPoolExecutor(
+                max_workers=current_app.config['THUMBNAIL_WORKERS'],
+                thread_name_prefix='thumbnails'
+            )
+        return state.executor
+
+    def enqueue(self, *video_ids):
+        """Ставит загрузку превью видео в фоновую очередь; возвращает futures"""
+        app = current_app._get_current_object()
+        executor = self._executor()
+        return [executor.submit(self._run, app, video_id) for video_id in video_ids]
+
+    def process_all(self, video_ids):
+        """Обрабатывает видео пулом и ждет завершения; возвращает {статус: число}"""
+        futures = self.enqueue(*video_ids)
+        wait(futures)
+        totals = {}
+        for future in futures:
+            status = future.result()
+            totals[status] = totals.get(status, 0) + 1
+        return totals
+
+    @staticmethod
+    def _run(app, video_id):
+        from app import db
+        with app.app_context():
+            try:
+                return process_thumbnail(video_id)
+            finally:
+                db.session.remove()
+
+
+def videos_to_fetch(recheck=False):
+    """Запрос id видео, превью которых нужно скачать (с recheck — всех)"""
+    from app import db
+    from app.models import Video
+    query = db.session.query(Video.id).filter(Video.youtube_id.isnot(None))
+    if not recheck:
+        query = query.filter(or_(Video.thumbnail_status.is_(None), Video.thumbnail_status == 'error'))
+    return query
+
+
+def process_thumbnail(video_id):
+    """Скачивает, проверяет и сохраняет превью видео; возвращает новый статус"""
+    from app import db
+    from app.models import Video
+
+    video = db.session.get(Video, video_id)
+    if video is None:
+        return 'gone'
+    if not video.youtube_id:
+        return 'skipped'
+
+    config = current_app.config
+    state = current_app.extensions['thumbnails']
+    digest = None
+    try:
+        data = state.fetcher(config['THUMBNAIL_SOURCE_URL'].format(youtube_id=video.youtube_id))
+        digest = state.store.save(prepare_image(data, config['THUMBNAIL_WIDTH'], config['THUMBNAIL_QUALITY']))
+        status = 'ok'
+    except ThumbnailNotFound as error:
+        logger.info('Нет превью для видео %s: %s', video_id, error)
+        status = 'missing'
+    except InvalidThumbnail as error:
+        # Обрезанный ответ или страница ошибки вместо картинки — не повод
+        # считать превью удаленным: fetch-thumbnails попробует снова
+        logger.warning('Некорректное превью видео %s: %s', video_id, error)
+        if video.thumbnail_status == 'ok':
+            return 'error'  # уже скачанная копия остается
+        status = 'error'
+    except Exception:
+        # Сетевые сбои: статус не меняем, следующий проход попробует снова
+        logger.exception('Не удалось скачать превью видео %s', video_id)
+        return 'error'
+
+    if (video.thumbnail_hash, video.thumbnail_status) != (digest, status):
+        # Мимо ORM: превью — служебные поля, а правка объекта сдвинула бы
+        # updated_at и change_seq, то есть ETag, кэш страниц и ленту изменений
+        videos = Video.__table__
+        db.session.execute(
+            update(videos)
+            .where(videos.c.id == video.id)
+            .values(thumbnail_hash=digest, thumbnail_status=status, updated_at=videos.c.updated_at)
+        )
+        db.session.commit()
+    return status
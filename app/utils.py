@@ -1,30 +1,40 @@
 import re
+from functools import lru_cache
+
+# Одно скомпилированное выражение на все формы ссылок: watch?v=, youtu.be/,
+# embed/, shorts/, live/, v/, хосты www., m., music. и youtube-nocookie.com
+_YOUTUBE_ID_RE = re.compile(r"""
+    (?:https?://)?
+    (?:(?:www|m|music)\.)?
+    (?:
+        youtu\.be/
+      | youtube(?:-nocookie)?\.com/
+        (?:
+            (?:embed|shorts|live|v)/
+          | watch\?(?:[^#]*?&)?v=
+        )
+    )
+    ([a-zA-Z0-9_-]+)
+""", re.VERBOSE)
+
+YOUTUBE_ID_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=YOUTUBE_ID_CACHE_SIZE)
+def _parse_youtube_id(youtube_url):
+    match = _YOUTUBE_ID_RE.search(youtube_url)
+    return match.group(1) if match else None
 
 def extract_youtube_id(youtube_url):
-    #Извлекает YouTube ID из любой формы ссылки
+    #Извлекает YouTube ID из любой формы ссылки (результаты кэшируются)
     if not youtube_url:
         return None
-        
-    patterns = [
-        # Стандартная ссылка: https://www.youtube.com/watch?v=VIDEO_ID
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)',
-        
-        # Короткая ссылка: https://youtu.be/VIDEO_ID  
-        r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]+)',
-        
-        # Embed ссылка: https://www.youtube.com/embed/VIDEO_ID
-        r'(?:https?://)?(?:www\.)?youtube\.com/embed/([a-zA-Z0-9_-]+)',
-        
-        # С таймкодом и другими параметрами
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?.*v=([a-zA-Z0-9_-]+)'
-    ]
-    
-    for pattern in patterns:
-        match = re.search(pattern, youtube_url)
-        if match:
-            return match.group(1)
-    
-    return None
+    return _parse_youtube_id(youtube_url)
+
+def extract_many(youtube_urls):
+    #YouTube ID для списка ссылок (None там, где ссылка не распознана)
+    parse = _parse_youtube_id
+    return [parse(url) if url else None for url in youtube_urls]
 
 def get_youtube_thumbnail(youtube_url, quality='hqdefault'):
     video_id = extract_youtube_id(youtube_url)
@@ -32,3 +42,11 @@ def get_youtube_thumbnail(youtube_url, quality='hqdefault'):
         return f'https://img.youtube.com/vi/{video_id}/{quality}.jpg'
     
     return None
+
+def get_youtube_embed_url(youtube_url, autoplay=True):
+    # Ссылка для iframe: watch- и youtu.be-ссылки во фрейме не открываются
+    video_id = extract_youtube_id(youtube_url)
+    if video_id:
+        return f'https://www.youtube-nocookie.com/embed/{video_id}' + ('?autoplay=1' if autoplay else '')
+    
+    return youtube_url
@@ -13,4 +13,92 @@ class Config:
         'sqlite:///' + os.path.join(basedir, 'instance', 'grenade_guide.db')
     
     # Отключаем систему отслеживания модификаций (экономит память)
-    SQLALCHEMY_TRACK_MODIFICATIONS = False
\ No newline at end of file
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    
+    # Реплика только для чтения: на нее идут GET-запросы (см. app/database.py),
+    # а после записи пользователь еще REPLICA_READ_YOUR_WRITES_SECONDS секунд читает с основной БД
+    SQLALCHEMY_REPLICA_URI = os.environ.get('DATABASE_REPLICA_URL') or None
+    REPLICA_READ_YOUR_WRITES_SECONDS = int(os.environ.get('REPLICA_READ_YOUR_WRITES_SECONDS') or 10)
+    
+    # SQLite под несколько воркеров: PRAGMA на каждое соединение (см. app/database.py)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)  # мс
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or -20000)  # < 0 — в КиБ
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    
+    # Пул соединений для PostgreSQL и других серверных СУБД (на процесс)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 30)
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', '1') == '1'
+    
+    # Размер страницы списка видео (можно переопределить параметром per_page в пределах максимума)
+    VIDEOS_PER_PAGE = int(os.environ.get('VIDEOS_PER_PAGE') or 24)
+    VIDEOS_MAX_PER_PAGE = int(os.environ.get('VIDEOS_MAX_PER_PAGE') or 100)
+    
+    # Кэш справочников карт/гранат и кэш пользователей Flask-Login (секунды, 0 — выключить)
+    REFERENCE_CACHE_TTL = int(os.environ.get('REFERENCE_CACHE_TTL') or 300)
+    # Кэш пользователей выключен по умолчанию: он свой у каждого процесса, и после
+    # смены роли или удаления пользователя другие воркеры до USER_CACHE_TTL секунд
+    # видят старую копию (снятый администратор сохраняет права)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 0)
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 1024)
+    
+    # Кэш страниц списка видео для анонимных посетителей:
+    # 'memory' — в памяти процесса, 'filesystem' — общий для всех воркеров каталог
+    PAGE_CACHE_BACKEND = os.environ.get('PAGE_CACHE_BACKEND') or 'memory'
+    PAGE_CACHE_TTL = int(os.environ.get('PAGE_CACHE_TTL') or 300)
+    PAGE_CACHE_SIZE = int(os.environ.get('PAGE_CACHE_SIZE') or 512)
+    PAGE_CACHE_DIR = os.environ.get('PAGE_CACHE_DIR') or os.path.join(basedir, 'instance', 'page_cache')
+    
+    # Локальные копии превью: каталог, число потоков загрузки и ширина
+    THUMBNAIL_DIR = os.environ.get('THUMBNAIL_DIR') or os.path.join(basedir, 'instance', 'thumbnails')
+    THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS') or 4)
+    THUMBNAIL_WIDTH = int(os.environ.get('THUMBNAIL_WIDTH') or 480)
+    # Откуда качать превью (для тестов — адрес локального сервера)
+    THUMBNAIL_SOURCE_URL = os.environ.get('THUMBNAIL_SOURCE_URL') or \
+        'https://img.youtube.com/vi/{youtube_id}/hqdefault.jpg'
+    # Отдача файлов веб-сервером: X-Sendfile (Apache, lighttpd) или
+    # X-Accel-Redirect с префиксом internal-location (nginx)
+    USE_X_SENDFILE = os.environ.get('USE_X_SENDFILE') == '1'
+    THUMBNAIL_ACCEL_PREFIX = os.environ.get('THUMBNAIL_ACCEL_PREFIX') or None
+    
+    # Метрики запросов на /metrics и заголовок Server-Timing (см. app/metrics.py)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED') == '1'
+    METRICS_SLOW_QUERY_MS = int(os.environ.get('METRICS_SLOW_QUERY_MS') or 200)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+    # Общий каталог снимков, чтобы /metrics суммировал все воркеры gunicorn
+    METRICS_DIR = os.environ.get('METRICS_DIR') or None
+    
+    # Сжатие ответов gzip/brotli (выключить, если сжимает прокси) и порог в байтах
+    COMPRESS_ENABLED = os.environ.get('COMPRESS_ENABLED', '1') == '1'
+    COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE') or 500)
+    # Собранная статика (`flask build-assets`); без нее файлы отдаются из app/static
+    ASSETS_DIR = os.environ.get('ASSETS_DIR') or os.path.join(basedir, 'app', 'static', 'dist')
+    
+    # Хэширование паролей: метод Werkzeug с параметрами (старые хэши пересчитываются при входе),
+    # потоки пула и сколько запросов может ждать своей очереди (сверх — 503).
+    # Ждущий запрос держит поток воркера, поэтому всего проверок одновременно
+    # не больше половины WEB_THREADS (потоков воркера, как в gunicorn.conf.py)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD') or 'pbkdf2:sha256:600000'
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 2)
+    PASSWORD_HASH_MAX_PENDING = int(os.environ.get('PASSWORD_HASH_MAX_PENDING') or 0)
+    WEB_THREADS = int(os.environ.get('WEB_THREADS') or 4)
+    
+    # Ограничение частоты (см. app/ratelimit.py): 'sqlite' — общий файл RATELIMIT_STORAGE
+    # для всех воркеров машины, 'memory' — на процесс (с N воркерами лимиты в N раз мягче)
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND') or 'sqlite'
+    RATELIMIT_STORAGE = os.environ.get('RATELIMIT_STORAGE') or os.path.join(basedir, 'instance', 'ratelimit.db')
+    RATELIMIT_LOGIN = os.environ.get('RATELIMIT_LOGIN') or '20/minute'  # попыток входа с одного IP
+    RATELIMIT_LOGIN_USERNAME = os.environ.get('RATELIMIT_LOGIN_USERNAME') or '5/minute'  # неудачных на одно имя
+    RATELIMIT_REGISTER = os.environ.get('RATELIMIT_REGISTER') or '5/hour'
+    RATELIMIT_ADD_VIDEO = os.environ.get('RATELIMIT_ADD_VIDEO') or '30/hour'  # на пользователя
+    RATELIMIT_ADD_VIDEO_IP = os.environ.get('RATELIMIT_ADD_VIDEO_IP') or '60/hour'
+    # Сколько обратных прокси перед приложением добавляют X-Forwarded-For (0 — нет прокси)
+    PROXY_FIX_X_FOR = int(os.environ.get('PROXY_FIX_X_FOR') or 0)
+    
+    # Максимальный номер страницы результатов поиска
+    SEARCH_MAX_PAGE = int(os.environ.get('SEARCH_MAX_PAGE') or 50)
@@ -0,0 +1,47 @@
+"""Настройки gunicorn (подхватываются автоматически из текущего каталога).
+
+Запуск: gunicorn wsgi:app  (или python serve.py)
+Все значения можно переопределить переменными окружения WEB_*.
+"""
+import multiprocessing
+import os
+
+
+def _env_int(name, default):
+    return int(os.environ.get(name) or default)
+
+
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.environ.get('WEB_BIND') or f"0.0.0.0:{os.environ.get('PORT') or 8000}"
+
+# Процессы на ядра, потоки внутри процесса — на ожидание БД и сети
+workers = _env_int('WEB_CONCURRENCY', 2 * cpu_count + 1)
+worker_class = 'gthread'
+threads = _env_int('WEB_THREADS', 4)
+
+# Keep-alive за балансировщиком: держим соединение чуть дольше, чем он
+keepalive = _env_int('WEB_KEEPALIVE', 5)
+timeout = _env_int('WEB_TIMEOUT', 30)
+graceful_timeout = _env_int('WEB_GRACEFUL_TIMEOUT', 30)
+
+# Перезапуск воркера после N запросов (с разбросом, чтобы не все сразу) от утечек памяти
+max_requests = _env_int('WEB_MAX_REQUESTS', 1000)
+max_requests_jitter = _env_int('WEB_MAX_REQUESTS_JITTER', 100)
+
+# Приложение импортируется один раз в мастере и делится с воркерами через fork
+# (copy-on-write); create_app до fork соединений с БД не открывает
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+
+accesslog = os.environ.get('WEB_ACCESS_LOG') or '-'
+errorlog = '-'
+loglevel = os.environ.get('WEB_LOG_LEVEL') or 'info'
+
+
+def on_starting(server):
+    # Снимки метрик прошлого запуска не должны попасть в сумму по воркерам
+    directory = os.environ.get('METRICS_DIR')
+    if directory and os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith('.json'):
+                os.remove(os.path.join(directory, name))
@@ -0,0 +1,44 @@
+"""denormalized video counters per combination and per author
+
+Revision ID: 4d1c8a7e2f90
+Revises: 9b4f2d6e1a37
+Create Date: 2025-10-28 10:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4d1c8a7e2f90'
+down_revision = '9b4f2d6e1a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('combination_stats',
+    sa.Column('map_id', sa.Integer(), nullable=False),
+    sa.Column('grenade_id', sa.Integer(), nullable=False),
+    sa.Column('video_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['grenade_id'], ['grenades.id'], ),
+    sa.ForeignKeyConstraint(['map_id'], ['maps.id'], ),
+    sa.PrimaryKeyConstraint('map_id', 'grenade_id')
+    )
+    op.create_table('author_stats',
+    sa.Column('author_id', sa.Integer(), nullable=False),
+    sa.Column('video_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['author_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('author_id')
+    )
+
+    # Начальные значения — один агрегат по существующим видео
+    op.execute('INSERT INTO combination_stats (map_id, grenade_id, video_count) '
+               'SELECT map_id, grenade_id, COUNT(*) FROM videos GROUP BY map_id, grenade_id')
+    op.execute('INSERT INTO author_stats (author_id, video_count) '
+               'SELECT author_id, COUNT(*) FROM videos GROUP BY author_id')
+
+
+def downgrade():
+    op.drop_table('author_stats')
+    op.drop_table('combination_stats')
@@ -0,0 +1,30 @@
+"""add id to video listing index for keyset pagination
+
+Revision ID: 5e8b0f3a9c21
+Revises: a1c4e9d27b3f
+Create Date: 2025-10-22 10:15:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b0f3a9c21'
+down_revision = 'a1c4e9d27b3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Ключ пагинации (created_at, id) должен целиком лежать в индексе,
+    # иначе при совпадающем created_at появляется сортировка во временном B-дереве
+    op.drop_index('ix_videos_map_grenade_created', table_name='videos')
+    op.create_index('ix_videos_map_grenade_created', 'videos',
+                    ['map_id', 'grenade_id', sa.text('created_at DESC'), sa.text('id DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_videos_map_grenade_created', table_name='videos')
+    op.create_index('ix_videos_map_grenade_created', 'videos',
+                    ['map_id', 'grenade_id', sa.text('created_at DESC')], unique=False)
@@ -0,0 +1,70 @@
+"""change feed: change_seq, tombstones and sequences
+
+Revision ID: 9b4f2d6e1a37
+Revises: e3a95b1c7d44
+Create Date: 2025-10-27 11:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9b4f2d6e1a37'
+down_revision = 'e3a95b1c7d44'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('change_seq', sa.BigInteger(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_videos_change_seq'), ['change_seq'], unique=False)
+        # Лента по одной комбинации читается по индексу без сортировки
+        batch_op.create_index('ix_videos_map_grenade_change', ['map_id', 'grenade_id', 'change_seq'], unique=False)
+
+    op.create_table('video_tombstones',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('video_id', sa.Integer(), nullable=False),
+    sa.Column('map_id', sa.Integer(), nullable=False),
+    sa.Column('grenade_id', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.Column('change_seq', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('video_tombstones', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_video_tombstones_change_seq'), ['change_seq'], unique=False)
+
+    sequences = op.create_table('change_sequences',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+    # Нумеруем существующие видео в порядке их последнего изменения
+    connection = op.get_bind()
+    ids = connection.execute(sa.text('SELECT id FROM videos ORDER BY updated_at, id')).scalars().all()
+    update = sa.text('UPDATE videos SET change_seq = :seq WHERE id = :id')
+    for start in range(0, len(ids), BATCH_SIZE):
+        batch = ids[start:start + BATCH_SIZE]
+        connection.execute(update, [{'seq': start + offset + 1, 'id': video_id}
+                                    for offset, video_id in enumerate(batch)])
+
+    op.bulk_insert(sequences, [
+        {'name': 'videos', 'value': len(ids)},
+        {'name': 'video_tombstones_pruned', 'value': 0},
+    ])
+
+
+def downgrade():
+    op.drop_table('change_sequences')
+    with op.batch_alter_table('video_tombstones', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_video_tombstones_change_seq'))
+    op.drop_table('video_tombstones')
+
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.drop_index('ix_videos_map_grenade_change')
+        batch_op.drop_index(batch_op.f('ix_videos_change_seq'))
+        batch_op.drop_column('change_seq')
@@ -0,0 +1,30 @@
+"""video listing indexes
+
+Revision ID: a1c4e9d27b3f
+Revises: 0334e68f712b
+Create Date: 2025-10-20 18:30:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1c4e9d27b3f'
+down_revision = '0334e68f712b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Выборка по карте и гранате сразу в нужном порядке сортировки
+    op.create_index('ix_videos_map_grenade_created', 'videos',
+                    ['map_id', 'grenade_id', sa.text('created_at DESC')], unique=False)
+    # Видео пользователя для страницы профиля
+    op.create_index('ix_videos_author_created', 'videos',
+                    ['author_id', sa.text('created_at DESC')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_videos_author_created', table_name='videos')
+    op.drop_index('ix_videos_map_grenade_created', table_name='videos')
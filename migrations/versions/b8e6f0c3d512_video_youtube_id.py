@@ -0,0 +1,76 @@
+"""normalized youtube_id column with a unique index
+
+Revision ID: b8e6f0c3d512
+Revises: 4d1c8a7e2f90
+Create Date: 2025-10-29 09:30:00.000000
+
+"""
+import re
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e6f0c3d512'
+down_revision = '4d1c8a7e2f90'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Копия разбора из app.utils на момент миграции (код приложения может измениться)
+YOUTUBE_ID_RE = re.compile(r"""
+    (?:https?://)?
+    (?:(?:www|m|music)\.)?
+    (?:
+        youtu\.be/
+      | youtube(?:-nocookie)?\.com/
+        (?:
+            (?:embed|shorts|live|v)/
+          | watch\?(?:[^#]*?&)?v=
+        )
+    )
+    ([a-zA-Z0-9_-]+)
+""", re.VERBOSE)
+
+
+def upgrade():
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('youtube_id', sa.String(length=32), nullable=True))
+
+    # Заполняем пачками по id; у дубликатов ID получает только самое раннее видео,
+    # у остальных youtube_id остается NULL (их можно удалить вручную)
+    connection = op.get_bind()
+    select = sa.text('SELECT id, video_url FROM videos WHERE id > :last ORDER BY id LIMIT :limit')
+    update = sa.text('UPDATE videos SET youtube_id = :youtube_id WHERE id = :id')
+    seen = set()
+    duplicates = 0
+    last = 0
+    while True:
+        rows = connection.execute(select, {'last': last, 'limit': BATCH_SIZE}).all()
+        if not rows:
+            break
+        last = rows[-1].id
+        params = []
+        for row in rows:
+            match = YOUTUBE_ID_RE.search(row.video_url or '')
+            if not match:
+                continue
+            if match.group(1) in seen:
+                duplicates += 1
+                continue
+            seen.add(match.group(1))
+            params.append({'youtube_id': match.group(1), 'id': row.id})
+        if params:
+            connection.execute(update, params)
+    if duplicates:
+        print(f'youtube_id: пропущено дубликатов: {duplicates}')
+
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_videos_youtube_id'), ['youtube_id'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_videos_youtube_id'))
+        batch_op.drop_column('youtube_id')
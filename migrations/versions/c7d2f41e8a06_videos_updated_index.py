@@ -0,0 +1,26 @@
+"""index for conditional GET validators
+
+Revision ID: c7d2f41e8a06
+Revises: 5e8b0f3a9c21
+Create Date: 2025-10-24 16:40:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d2f41e8a06'
+down_revision = '5e8b0f3a9c21'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # MAX(updated_at) и COUNT(*) по комбинации читаются только из индекса
+    op.create_index('ix_videos_map_grenade_updated', 'videos',
+                    ['map_id', 'grenade_id', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_videos_map_grenade_updated', table_name='videos')
@@ -0,0 +1,67 @@
+"""videos.created_at NOT NULL (keyset pagination key)
+
+Revision ID: d5f1a3b7c920
+Revises: f2a7c9e4b618
+Create Date: 2025-11-03 10:20:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5f1a3b7c920'
+down_revision = 'f2a7c9e4b618'
+branch_labels = None
+depends_on = None
+
+
+# В SQLite batch-режим пересоздает таблицу videos: триггеры полнотекстового
+# поиска (см. e3a95b1c7d44) удаляются вместе с ней, а индексы восстанавливаются
+# по отражению без DESC — и те, и другие ставим заново
+DESC_INDEXES = {
+    'ix_videos_map_grenade_created': ['map_id', 'grenade_id', sa.text('created_at DESC'), sa.text('id DESC')],
+    'ix_videos_author_created': ['author_id', sa.text('created_at DESC')],
+}
+
+SQLITE_FTS_TRIGGERS = [
+    """CREATE TRIGGER videos_fts_insert AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER videos_fts_delete AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER videos_fts_update AFTER UPDATE OF title, description ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO videos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+]
+
+
+def _alter_created_at(nullable):
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    if sqlite:
+        for name in DESC_INDEXES:
+            op.drop_index(name, table_name='videos')
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.alter_column('created_at', existing_type=sa.DateTime(), nullable=nullable)
+    if sqlite:
+        for name, columns in DESC_INDEXES.items():
+            op.create_index(name, 'videos', columns, unique=False)
+        for statement in SQLITE_FTS_TRIGGERS:
+            op.execute(statement)
+
+
+def upgrade():
+    # Строки без даты (вставленные в обход ORM) получают дату последней правки
+    op.execute('UPDATE videos SET created_at = COALESCE(updated_at, CURRENT_TIMESTAMP) '
+               'WHERE created_at IS NULL')
+    _alter_created_at(nullable=False)
+
+
+def downgrade():
+    _alter_created_at(nullable=True)
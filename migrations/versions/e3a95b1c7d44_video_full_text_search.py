@@ -0,0 +1,75 @@
+"""full-text search over video titles and descriptions
+
+Revision ID: e3a95b1c7d44
+Revises: c7d2f41e8a06
+Create Date: 2025-10-27 11:05:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a95b1c7d44'
+down_revision = 'c7d2f41e8a06'
+branch_labels = None
+depends_on = None
+
+
+SQLITE_UPGRADE = [
+    """CREATE VIRTUAL TABLE videos_fts USING fts5(
+        title, description,
+        content='videos', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )""",
+    # Ранжирование bm25 с весом названия 10 к описанию: сохраняется в самой
+    # таблице, и ORDER BY rank сортирует прямо внутри FTS5
+    "INSERT INTO videos_fts(videos_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """CREATE TRIGGER videos_fts_insert AFTER INSERT ON videos BEGIN
+        INSERT INTO videos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    """CREATE TRIGGER videos_fts_delete AFTER DELETE ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END""",
+    """CREATE TRIGGER videos_fts_update AFTER UPDATE OF title, description ON videos BEGIN
+        INSERT INTO videos_fts(videos_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO videos_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END""",
+    # Индексируем уже существующие видео
+    "INSERT INTO videos_fts(videos_fts) VALUES ('rebuild')",
+]
+
+POSTGRES_UPGRADE = [
+    """ALTER TABLE videos ADD COLUMN search_vector tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(description, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX ix_videos_search_vector ON videos USING gin (search_vector)",
+]
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_UPGRADE:
+            op.execute(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRES_UPGRADE:
+            op.execute(statement)
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS videos_fts_update')
+        op.execute('DROP TRIGGER IF EXISTS videos_fts_delete')
+        op.execute('DROP TRIGGER IF EXISTS videos_fts_insert')
+        op.execute('DROP TABLE IF EXISTS videos_fts')
+    elif dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_videos_search_vector')
+        op.execute('ALTER TABLE videos DROP COLUMN IF EXISTS search_vector')
@@ -0,0 +1,29 @@
+"""local thumbnail copies: hash and status
+
+Revision ID: f2a7c9e4b618
+Revises: b8e6f0c3d512
+Create Date: 2025-10-30 14:10:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c9e4b618'
+down_revision = 'b8e6f0c3d512'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Заполняется командой `flask fetch-thumbnails`
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('thumbnail_hash', sa.String(length=64), nullable=True))
+        batch_op.add_column(sa.Column('thumbnail_status', sa.String(length=16), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('videos', schema=None) as batch_op:
+        batch_op.drop_column('thumbnail_status')
+        batch_op.drop_column('thumbnail_hash')
@@ -4,5 +4,8 @@ from app import create_app
 app = create_app()
 
 # Запускаем приложение только если файл запущен напрямую
+# (сервер разработки; в продакшене — python serve.py или gunicorn wsgi:app)
 if __name__ == '__main__':
+    from app.assets import check_vendor_assets
+    check_vendor_assets(app.static_folder)
     app.run(debug=True)  # debug=True включает режим отладки
\ No newline at end of file
@@ -0,0 +1,476 @@
+"""Бенчмарк горячих страниц: /, /videos, /export-links и /login.
+
+Строит синтетический каталог из --videos видео (от 10 тыс. до 1 млн) по
+картам и гранатам из scripts/init_db.py и меряет страницы одним из способов:
+  client — тестовый клиент Flask в этом же процессе (без сети и сервера);
+  http   — gunicorn (или waitress) с --server-workers воркерами и
+           нагрузка из --processes процессов по keep-alive соединениям.
+Результат — JSON с p50/p95/p99, пропускной способностью и пиковым RSS
+по каждой странице; два таких файла сравнивает --compare.
+
+Каталог строится один раз (генератор с фиксированным seed) и лежит
+в --data-dir как catalogue-<N>.db; --rebuild строит заново.
+CSRF и ограничение частоты в бенчмарке выключены, чтобы POST /login можно
+было слать без формы и без 429.
+
+Запуск:
+  python scripts/bench_endpoints.py --videos 100000 --mode client --output before.json
+  python scripts/bench_endpoints.py --videos 100000 --mode http --processes 4 --seconds 10
+  python scripts/bench_endpoints.py --compare before.json after.json
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import platform
+import random
+import socket
+import string
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from urllib.parse import urlencode
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from werkzeug.security import generate_password_hash
+from flask_migrate import upgrade
+from config import Config
+from app import create_app, db
+from app.models import User, Map, Grenade
+from app.importer import VideoImporter
+from scripts.init_db import MAPS, GRENADES
+
+BENCH_USER = 'bench'
+BENCH_PASSWORD = 'bench123'
+# Комбинация, которую открывают /videos и /export-links
+BENCH_MAP = 'de_dust2'
+BENCH_GRENADE = 'smoke'
+
+# Имя: (метод, адрес); {map} и {grenade} — id комбинации выше
+ENDPOINTS = {
+    'index': ('GET', '/'),
+    'videos': ('GET', '/videos?map={map}&grenade={grenade}'),
+    'export_links': ('GET', '/export-links?map={map}&grenade={grenade}&format=txt'),
+    'login_form': ('GET', '/login'),
+    'login': ('POST', '/login'),
+}
+
+WORDS = ('smoke', 'flash', 'molotov', 'xbox', 'window', 'jungle', 'connector', 'banana',
+         'long', 'short', 'mid', 'ramp', 'heaven', 'outside', 'lineup', 'jumpthrow')
+
+
+def make_config(url, page_cache):
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url
+        SQLALCHEMY_REPLICA_URI = None
+        WTF_CSRF_ENABLED = False
+        PAGE_CACHE_BACKEND = 'memory' if page_cache else None
+        THUMBNAIL_DIR = tempfile.mkdtemp(prefix='bench-thumbs-')
+        METRICS_ENABLED = False
+        RATELIMIT_ENABLED = False
+
+    return BenchConfig
+
+
+# --- каталог ---------------------------------------------------------------
+
+def synthetic_records(count, seed=42):
+    """count записей для импорта, одинаковых при одном seed"""
+    rng = random.Random(seed)
+    alphabet = string.ascii_letters + string.digits + '_-'
+    map_names = [name for name, _ in MAPS]
+    grenade_names = [name for name, _, _ in GRENADES]
+    for number in range(count):
+        # Номер в начале id гарантирует уникальность, остальное — шум
+        youtube_id = f'{number:07d}' + ''.join(rng.choices(alphabet, k=4))
+        yield {
+            'title': ' '.join(rng.choices(WORDS, k=4)).capitalize() + f' #{number}',
+            'description': ' '.join(rng.choices(WORDS, k=12)),
+            'url': f'https://youtu.be/{youtube_id}',
+            'map': rng.choice(map_names),
+            'grenade': rng.choice(grenade_names),
+        }
+
+
+def build_catalogue(path, videos):
+    """Создает базу миграциями и заполняет ее; возвращает время в секундах"""
+    started = time.perf_counter()
+    app = create_app(make_config('sqlite:///' + path, page_cache=False))
+    with app.app_context():
+        upgrade(directory=os.path.join(project_root, 'migrations'))
+        db.session.add_all([Map(name=name, display_name=display_name) for name, display_name in MAPS])
+        db.session.add_all([Grenade(name=name, display_name=display_name, color=color)
+                            for name, display_name, color in GRENADES])
+        author = User(username=BENCH_USER, email='bench@example.com',
+                      password_hash=generate_password_hash(BENCH_PASSWORD))
+        db.session.add(author)
+        db.session.commit()
+
+        def progress(stats):
+            print(f'\r  видео: {stats.inserted}/{videos}', end='', file=sys.stderr, flush=True)
+
+        VideoImporter(author, chunk_size=5000, on_chunk=progress).run(synthetic_records(videos))
+        print(file=sys.stderr)
+        db.session.execute(db.text('ANALYZE'))
+        db.session.commit()
+        for engine in db.engines.values():
+            engine.dispose()
+    return time.perf_counter() - started
+
+
+def catalogue(args):
+    """Путь к базе нужного размера (строит ее при необходимости) и время сборки"""
+    os.makedirs(args.data_dir, exist_ok=True)
+    path = os.path.join(args.data_dir, f'catalogue-{args.videos}.db')
+    if args.rebuild or not os.path.exists(path):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        print(f'Строим каталог из {args.videos} видео: {path}', file=sys.stderr)
+        return path, build_catalogue(path, args.videos)
+    return path, None
+
+
+def endpoint_paths(app):
+    with app.app_context():
+        map_id = Map.query.filter_by(name=BENCH_MAP).one().id
+        grenade_id = Grenade.query.filter_by(name=BENCH_GRENADE).one().id
+    return {name: (method, path.format(map=map_id, grenade=grenade_id))
+            for name, (method, path) in ENDPOINTS.items()}
+
+
+LOGIN_FORM = {'username': BENCH_USER, 'password': BENCH_PASSWORD}
+
+
+# --- замеры -----------------------------------------------------------------
+
+def percentile(sorted_values, fraction):
+    """Процентиль с линейной интерполяцией"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(method, path, latencies, errors, elapsed, peak_rss):
+    latencies = sorted(latencies)
+    return {
+        'method': method,
+        'path': path,
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        **peak_rss,
+    }
+
+
+def _proc_status_kb(pid, field):
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss(pids):
+    """Сбрасывает VmHWM процессов (Linux); без /proc ничего не делает"""
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/clear_refs', 'w') as f:
+                f.write('5')
+        except OSError:
+            pass
+
+
+def peak_rss(pids):
+    """Пиковый RSS (КиБ): наибольший у одного процесса и сумма по всем"""
+    values = [_proc_status_kb(pid, 'VmHWM') for pid in pids]
+    values = [value for value in values if value is not None]
+    if not values and pids == [os.getpid()] and resource is not None:
+        # Без /proc — пик за всю жизнь процесса (на macOS в байтах)
+        value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        values = [value // 1024 if sys.platform == 'darwin' else value]
+    if not values:
+        return {'peak_rss_kb': None}
+    return {'peak_rss_kb': max(values), 'peak_rss_total_kb': sum(values)}
+
+
+def run_client(app, paths, args):
+    """Последовательные запросы тестовым клиентом в этом процессе"""
+    client = app.test_client(use_cookies=False)
+    pid = [os.getpid()]
+    results = {}
+    for name, (method, path) in paths.items():
+        def request():
+            if method == 'POST':
+                return client.post(path, data=LOGIN_FORM)
+            return client.get(path)
+
+        for _ in range(args.warmup):
+            request().close()
+        reset_peak_rss(pid)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        deadline = started + args.seconds if args.seconds else None
+        while (deadline and time.perf_counter() < deadline) or (not deadline and len(latencies) < args.requests):
+            request_started = time.perf_counter()
+            response = request()
+            response.get_data()
+            latencies.append(time.perf_counter() - request_started)
+            errors += response.status_code >= 400
+            response.close()
+        elapsed = time.perf_counter() - started
+        results[name] = summarize(method, path, latencies, errors, elapsed, peak_rss(pid))
+        print(f'  {name}: p50 {results[name]["p50_ms"]} мс', file=sys.stderr)
+    return results
+
+
+# --- HTTP -----------------------------------------------------------------
+
+def _serve(url, page_cache, host, port, workers, threads, ready):
+    """Процесс сервера: gunicorn, а без него (Windows) — waitress"""
+    app = create_app(make_config(url, page_cache))
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        from waitress import serve
+        ready.set()
+        serve(app, host=host, port=port, threads=workers * threads, _quiet=True)
+        return
+
+    class BenchServer(BaseApplication):
+        def load_config(self):
+            for key, value in {
+                'bind': f'{host}:{port}', 'workers': workers, 'threads': threads,
+                'worker_class': 'gthread', 'preload_app': True, 'loglevel': 'warning',
+                'accesslog': None, 'when_ready': lambda server: ready.set(),
+            }.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    BenchServer().run()
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _children(pid):
+    """Дочерние процессы (воркеры gunicorn) по /proc"""
+    children = []
+    for entry in os.listdir('/proc') if os.path.isdir('/proc') else ():
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Имя процесса в скобках может содержать пробелы
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid:
+            children.append(int(entry))
+    return children
+
+
+def _load_worker(job):
+    """Один процесс нагрузки: запросы по одному keep-alive соединению"""
+    host, port, method, path, requests, seconds = job
+    body = urlencode(LOGIN_FORM) if method == 'POST' else None
+    headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+    connection = http.client.HTTPConnection(host, port, timeout=60)
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds if seconds else None
+    while (deadline and time.perf_counter() < deadline) or (not deadline and len(latencies) < requests):
+        started = time.perf_counter()
+        try:
+            connection.request(method, path, body=body, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            connection = http.client.HTTPConnection(host, port, timeout=60)
+            status = 599
+        latencies.append(time.perf_counter() - started)
+        errors += status >= 400
+    connection.close()
+    return latencies, errors
+
+
+def run_http(url, paths, args):
+    """Сервер в отдельном процессе и нагрузка из args.processes процессов"""
+    host, port = '127.0.0.1', _free_port()
+    context = multiprocessing.get_context('spawn')
+    ready = context.Event()
+    server = context.Process(target=_serve, args=(
+        url, not args.no_page_cache, host, port, args.server_workers, args.server_threads, ready))
+    server.start()
+    try:
+        if not ready.wait(60):
+            raise RuntimeError('Сервер не запустился за 60 с')
+        for _ in range(100):
+            try:
+                socket.create_connection((host, port), timeout=1).close()
+                break
+            except OSError:
+                time.sleep(0.1)
+        server_pids = _children(server.pid) or [server.pid]
+
+        results = {}
+        per_process = max(1, args.requests // args.processes)
+        with context.Pool(args.processes) as pool:
+            for name, (method, path) in paths.items():
+                pool.map(_load_worker, [(host, port, method, path, args.warmup, 0)] * args.processes)
+                reset_peak_rss(server_pids)
+                jobs = [(host, port, method, path, per_process, args.seconds)] * args.processes
+                started = time.perf_counter()
+                outcomes = pool.map(_load_worker, jobs)
+                elapsed = time.perf_counter() - started
+                latencies = [latency for part, _ in outcomes for latency in part]
+                errors = sum(part_errors for _, part_errors in outcomes)
+                results[name] = summarize(method, path, latencies, errors, elapsed, peak_rss(server_pids))
+                print(f'  {name}: p50 {results[name]["p50_ms"]} мс, '
+                      f'{results[name]["throughput_rps"]} запр/с', file=sys.stderr)
+        return results
+    finally:
+        server.terminate()
+        server.join(10)
+
+
+# --- отчет -----------------------------------------------------------------
+
+def git_revision():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=project_root,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'],
+                                    cwd=project_root, capture_output=True, text=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def compare(base_path, current_path):
+    """Печатает изменение метрик current относительно base"""
+    with open(base_path, encoding='utf-8') as f:
+        base = json.load(f)
+    with open(current_path, encoding='utf-8') as f:
+        current = json.load(f)
+    print(f"{base['meta'].get('commit') or '?':.10} -> {current['meta'].get('commit') or '?':.10}")
+    for key in ('mode', 'videos', 'page_cache', 'processes'):
+        if base['meta'].get(key) != current['meta'].get(key):
+            print(f"Внимание: разные {key}: {base['meta'].get(key)} и {current['meta'].get(key)}")
+    metrics = ('p50_ms', 'p95_ms', 'p99_ms', 'throughput_rps', 'peak_rss_kb')
+    print(f"{'страница':<14}" + ''.join(f'{metric:>28}' for metric in metrics))
+    for name, result in current['endpoints'].items():
+        before = base['endpoints'].get(name)
+        if before is None:
+            continue
+        cells = []
+        for metric in metrics:
+            old, new = before.get(metric), result.get(metric)
+            if not old or new is None:
+                cells.append(f'{"-":>28}')
+                continue
+            cells.append(f'{f"{old:g} -> {new:g} ({(new - old) / old * 100:+.0f}%)":>28}')
+        print(f'{name:<14}' + ''.join(cells))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--videos', type=int, default=10000, help='Размер каталога')
+    parser.add_argument('--mode', choices=('client', 'http'), default='client')
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS),
+                        help='Через запятую, из: ' + ', '.join(ENDPOINTS))
+    parser.add_argument('--requests', type=int, default=200, help='Запросов на страницу')
+    parser.add_argument('--seconds', type=float, default=0,
+                        help='Вместо --requests: сколько секунд гонять каждую страницу')
+    parser.add_argument('--warmup', type=int, default=10)
+    parser.add_argument('--processes', type=int, default=os.cpu_count() or 2,
+                        help='Процессов нагрузки (http)')
+    parser.add_argument('--server-workers', type=int, default=2, help='Воркеров gunicorn (http)')
+    parser.add_argument('--server-threads', type=int, default=4, help='Потоков на воркер (http)')
+    parser.add_argument('--no-page-cache', action='store_true', help='Выключить кэш страниц')
+    parser.add_argument('--data-dir', default=os.path.join(project_root, 'instance', 'bench'))
+    parser.add_argument('--rebuild', action='store_true', help='Построить каталог заново')
+    parser.add_argument('--output', help='Файл для JSON (по умолчанию stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASE', 'CURRENT'),
+                        help='Сравнить два JSON-отчета и выйти')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    selected = [name.strip() for name in args.endpoints.split(',') if name.strip()]
+    unknown = set(selected) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"неизвестные страницы: {', '.join(sorted(unknown))}")
+
+    path, build_seconds = catalogue(args)
+    url = 'sqlite:///' + path
+    app = create_app(make_config(url, page_cache=not args.no_page_cache))
+    paths = {name: value for name, value in endpoint_paths(app).items() if name in selected}
+
+    print(f'Режим {args.mode}, каталог {args.videos} видео', file=sys.stderr)
+    if args.mode == 'client':
+        results = run_client(app, paths, args)
+    else:
+        results = run_http(url, paths, args)
+
+    commit, dirty = git_revision()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'mode': args.mode,
+            'videos': args.videos,
+            'catalogue_build_seconds': round(build_seconds, 1) if build_seconds else None,
+            'page_cache': not args.no_page_cache,
+            'requests': args.requests,
+            'seconds': args.seconds,
+            'warmup': args.warmup,
+            'processes': args.processes if args.mode == 'http' else 1,
+            'server_workers': args.server_workers if args.mode == 'http' else None,
+            'server_threads': args.server_threads if args.mode == 'http' else None,
+        },
+        'endpoints': results,
+    }
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+        print(f'Отчет: {args.output}', file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
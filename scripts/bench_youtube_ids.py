@@ -0,0 +1,101 @@
+"""Микро-бенчмарк разбора YouTube-ссылок: прежняя версия против app.utils.
+
+Запуск: python scripts/bench_youtube_ids.py [--urls 100000] [--unique 5000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import string
+import sys
+import timeit
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from app.utils import extract_youtube_id, extract_many, _parse_youtube_id
+
+
+def legacy_extract_youtube_id(youtube_url):
+    # Прежняя реализация: до четырех некомпилированных re.search на ссылку
+    if not youtube_url:
+        return None
+    patterns = [
+        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]+)',
+        r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]+)',
+        r'(?:https?://)?(?:www\.)?youtube\.com/embed/([a-zA-Z0-9_-]+)',
+        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?.*v=([a-zA-Z0-9_-]+)'
+    ]
+    for pattern in patterns:
+        match = re.search(pattern, youtube_url)
+        if match:
+            return match.group(1)
+    return None
+
+
+# Формы ссылок, которые понимали обе версии
+URL_FORMS = [
+    'https://www.youtube.com/watch?v={}',
+    'https://youtube.com/watch?v={}&t=42s',
+    'https://www.youtube.com/watch?feature=share&v={}',
+    'https://youtu.be/{}',
+    'https://youtu.be/{}?t=10',
+    'https://www.youtube.com/embed/{}',
+]
+
+
+def make_urls(count, unique):
+    """count ссылок на unique разных видео в разных формах"""
+    rng = random.Random(42)
+    alphabet = string.ascii_letters + string.digits + '_-'
+    ids = [''.join(rng.choices(alphabet, k=11)) for _ in range(unique)]
+    return [rng.choice(URL_FORMS).format(rng.choice(ids)) for _ in range(count)]
+
+
+def best_of(func, repeat):
+    return min(timeit.repeat(func, number=1, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--urls', type=int, default=100000)
+    parser.add_argument('--unique', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    urls = make_urls(args.urls, args.unique)
+    mismatches = [url for url in urls if legacy_extract_youtube_id(url) != extract_youtube_id(url)]
+    if mismatches:
+        print(f'Результаты расходятся, например: {mismatches[0]}')
+        sys.exit(1)
+
+    uncached = _parse_youtube_id.__wrapped__
+
+    def run_uncached():
+        for url in urls:
+            uncached(url)
+
+    def run_cached():
+        _parse_youtube_id.cache_clear()
+        for url in urls:
+            extract_youtube_id(url)
+
+    def run_many():
+        _parse_youtube_id.cache_clear()
+        extract_many(urls)
+
+    legacy = best_of(lambda: [legacy_extract_youtube_id(url) for url in urls], args.repeat)
+    results = [
+        ('прежняя версия', legacy),
+        ('одно выражение, без кэша', best_of(run_uncached, args.repeat)),
+        ('extract_youtube_id (LRU)', best_of(run_cached, args.repeat)),
+        ('extract_many (LRU)', best_of(run_many, args.repeat)),
+    ]
+    print(f'{args.urls} ссылок, {args.unique} разных видео, лучшее из {args.repeat}')
+    for name, seconds in results:
+        print(f'  {name:<28} {seconds * 1000:8.1f} мс  '
+              f'{args.urls / seconds:>12,.0f} ссылок/с  x{legacy / seconds:.1f}')
+
+
+if __name__ == '__main__':
+    main()
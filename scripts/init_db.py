@@ -10,6 +10,22 @@ from app.models import User, Map, Grenade, Video
 from werkzeug.security import generate_password_hash
 from datetime import datetime
 
+# Справочники (их же использует scripts/bench_endpoints.py)
+MAPS = [
+    ('de_mirage', 'Mirage'),
+    ('de_inferno', 'Inferno'),
+    ('de_dust2', 'Dust II'),
+    ('de_nuke', 'Nuke'),
+    ('de_vertigo', 'Vertigo'),
+]
+
+GRENADES = [
+    ('smoke', 'Smoke Grenade', 'success'),
+    ('flash', 'Flashbang', 'warning'),
+    ('he', 'HE Grenade', 'danger'),
+    ('molotov', 'Molotov', 'danger'),
+]
+
 def init_database():
     # Создаем приложение
     app = create_app()
@@ -33,23 +49,15 @@ def init_database():
         db.session.flush()  # Получаем ID пользователя
         
         print("🗺️ Добавляем карты...")
-        maps = [
-            Map(name='de_mirage', display_name='Mirage'),
-            Map(name='de_inferno', display_name='Inferno'),
-            Map(name='de_dust2', display_name='Dust II'),
-            Map(name='de_nuke', display_name='Nuke'),
-            Map(name='de_vertigo', display_name='Vertigo')
-        ]
+        maps = [Map(name=name, display_name=display_name) for name, display_name in MAPS]
         
         for map_obj in maps:
             db.session.add(map_obj)
         
         print("💣 Добавляем гранаты...")
         grenades = [
-            Grenade(name='smoke', display_name='Smoke Grenade', color='success'),
-            Grenade(name='flash', display_name='Flashbang', color='warning'),
-            Grenade(name='he', display_name='HE Grenade', color='danger'),
-            Grenade(name='molotov', display_name='Molotov', color='danger')
+            Grenade(name=name, display_name=display_name, color=color)
+            for name, display_name, color in GRENADES
         ]
         
         for grenade in grenades:
@@ -0,0 +1,171 @@
+"""Нагрузочная проверка БД: много потоков одновременно читают и пишут.
+
+Создает временную SQLite-базу (или берет DATABASE_URL с --url), запускает
+читателей (страницы /videos через тестовый клиент) и писателей (добавление,
+правка и удаление видео через ORM) и считает ошибки блокировок.
+
+Запуск: python scripts/stress_db.py [--readers 16] [--writers 4] [--seconds 10] [--no-tuning]
+С --no-tuning PRAGMA отключаются (журнал DELETE, без busy_timeout) — для сравнения.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, project_root)
+
+from sqlalchemy.exc import OperationalError
+from config import Config
+from app import create_app, db
+from app.models import User, Map, Grenade, Video
+
+
+def make_config(url, tuned):
+    class StressConfig(Config):
+        SQLALCHEMY_DATABASE_URI = url
+        PAGE_CACHE_BACKEND = None
+        USER_CACHE_TTL = 0
+        THUMBNAIL_DIR = tempfile.mkdtemp(prefix='stress-thumbs-')
+
+    if not tuned:
+        StressConfig.SQLITE_JOURNAL_MODE = 'DELETE'
+        StressConfig.SQLITE_SYNCHRONOUS = 'FULL'
+        StressConfig.SQLITE_BUSY_TIMEOUT = 0
+    return StressConfig
+
+
+def seed(app, videos):
+    with app.app_context():
+        db.create_all()
+        if Map.query.first() is not None:
+            return
+        author = User(username='stress', email='stress@example.com', password_hash='-')
+        maps = [Map(name=f'de_map{i}', display_name=f'Map {i}') for i in range(3)]
+        grenades = [Grenade(name=f'g{i}', display_name=f'Grenade {i}', color='info') for i in range(2)]
+        db.session.add_all([author] + maps + grenades)
+        db.session.flush()
+        db.session.add_all(
+            Video(title=f'Seed {i}', video_url=f'https://youtu.be/seed{i:07d}', author=author,
+                  map=random.choice(maps), grenade=random.choice(grenades))
+            for i in range(videos)
+        )
+        db.session.commit()
+
+
+class Worker(threading.Thread):
+    def __init__(self, app, deadline, results):
+        super().__init__(daemon=True)
+        self.app = app
+        self.deadline = deadline
+        self.results = results
+        self.latencies = []
+
+    def run(self):
+        rng = random.Random(self.name)
+        while time.monotonic() < self.deadline:
+            started = time.perf_counter()
+            try:
+                outcome = self.step(rng)
+            except OperationalError as error:
+                outcome = 'locked' if 'locked' in str(error) else 'db error'
+            except Exception as error:
+                outcome = type(error).__name__
+            self.latencies.append(time.perf_counter() - started)
+            self.results[outcome] += 1
+
+
+class Reader(Worker):
+    def step(self, rng):
+        client = self.app.test_client()
+        response = client.get(f'/videos?map={rng.randint(1, 3)}&grenade={rng.randint(1, 2)}')
+        if response.status_code == 500:
+            raise OperationalError('GET /videos', {}, Exception('locked or failed'))
+        return 'read'
+
+
+class Writer(Worker):
+    counter = 0
+    lock = threading.Lock()
+
+    def step(self, rng):
+        with self.app.app_context():
+            try:
+                action = rng.random()
+                if action < 0.6:
+                    with Writer.lock:
+                        Writer.counter += 1
+                        number = Writer.counter
+                    db.session.add(Video(
+                        title=f'Stress {self.name} {number}',
+                        video_url=f'https://youtu.be/{self.name[:4]}{number:07d}',
+                        author_id=1, map_id=rng.randint(1, 3), grenade_id=rng.randint(1, 2)
+                    ))
+                    outcome = 'insert'
+                else:
+                    video = Video.query.filter(Video.title.like(f'Stress {self.name} %')) \
+                        .order_by(Video.id.desc()).first()
+                    if video is None:
+                        return 'noop'
+                    if action < 0.85:
+                        video.title = video.title + '!'
+                        outcome = 'update'
+                    else:
+                        db.session.delete(video)
+                        outcome = 'delete'
+                db.session.commit()
+                return outcome
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))] if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='URL базы (по умолчанию — временный файл SQLite)')
+    parser.add_argument('--readers', type=int, default=16)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--videos', type=int, default=500, help='Видео в новой базе')
+    parser.add_argument('--no-tuning', action='store_true')
+    args = parser.parse_args()
+
+    url = args.url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='stress-db-'), 'stress.db')
+    app = create_app(make_config(url, tuned=not args.no_tuning))
+    seed(app, args.videos)
+
+    results = Counter()
+    deadline = time.monotonic() + args.seconds
+    readers = [Reader(app, deadline, results) for _ in range(args.readers)]
+    writers = [Writer(app, deadline, results) for _ in range(args.writers)]
+    for worker in readers + writers:
+        worker.start()
+    for worker in readers + writers:
+        worker.join()
+
+    errors = {key: count for key, count in results.items()
+              if key not in ('read', 'insert', 'update', 'delete', 'noop')}
+    print(f'{url} ({"без настроек" if args.no_tuning else "WAL и PRAGMA"}), {args.seconds:.0f} с')
+    for name, workers in (('чтение', readers), ('запись', writers)):
+        latencies = [latency for worker in workers for latency in worker.latencies]
+        print(f'  {name}: {len(latencies) / args.seconds:8.1f} оп/с, '
+              f'p50 {percentile(latencies, 0.5) * 1000:.1f} мс, p99 {percentile(latencies, 0.99) * 1000:.1f} мс')
+    print('  операции:', dict(sorted(results.items())))
+    if errors:
+        print('  ОШИБКИ:', errors)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+"""Запуск сайта продакшен-сервером.
+
+APP_SERVER выбирает сервер: 'gunicorn' (по умолчанию, Linux/macOS: процессы
+и потоки, настройки в gunicorn.conf.py) или 'waitress' (Windows: один процесс
+с пулом потоков). Для разработки по-прежнему есть run.py.
+"""
+import multiprocessing
+import os
+import sys
+
+
+def run_gunicorn():
+    from gunicorn.app.wsgiapp import run
+    config = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gunicorn.conf.py')
+    sys.argv = ['gunicorn', '--config', config, 'wsgi:app']
+    run()
+
+
+def run_waitress():
+    from waitress import serve
+    # Один процесс: потоков столько, сколько суммарно дал бы gunicorn
+    threads = int(os.environ.get('WEB_THREADS') or 4 * multiprocessing.cpu_count())
+    # Приложение делит потоки между проверками паролей и страницами по WEB_THREADS
+    os.environ['WEB_THREADS'] = str(threads)
+    from wsgi import app
+    serve(
+        app,
+        host=os.environ.get('WEB_HOST') or '0.0.0.0',
+        port=int(os.environ.get('PORT') or 8000),
+        threads=threads,
+        channel_timeout=int(os.environ.get('WEB_TIMEOUT') or 30),
+        connection_limit=int(os.environ.get('WEB_CONNECTION_LIMIT') or 1000),
+    )
+
+
+SERVERS = {
+    'gunicorn': run_gunicorn,
+    'waitress': run_waitress,
+}
+
+
+if __name__ == '__main__':
+    default = 'waitress' if sys.platform == 'win32' else 'gunicorn'
+    server = os.environ.get('APP_SERVER') or default
+    if server not in SERVERS:
+        sys.exit(f"Неизвестный сервер {server!r}, доступны: {', '.join(SERVERS)}")
+    SERVERS[server]()
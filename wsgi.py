@@ -0,0 +1,7 @@
+"""WSGI-точка входа для продакшен-серверов: gunicorn wsgi:app, waitress-serve wsgi:app"""
+from app import create_app
+from app.assets import check_vendor_assets
+
+app = create_app()
+# Без сторонних CSS/JS страницы сломаны: сервер не запускается вовсе
+check_vendor_assets(app.static_folder)